@@ -0,0 +1,105 @@
+"""Account balances fetched once and shared.
+
+`get_account` costs 10 request weight and returns every asset as a list.
+`AccountSnapshot` fetches it once, indexes the balances by asset and keeps
+them until they are older than `ttl` or `refresh` is called after an order
+changed them. `snapshot_for` shares one snapshot per account, so a daemon
+that runs buy after buy does not re-fetch balances each time.
+"""
+
+# core
+import collections
+import threading
+import time
+
+ACCOUNT_TTL = 60
+"Seconds a shared snapshot is trusted."
+
+Balance = collections.namedtuple('Balance', 'asset free locked')
+"One asset's balance, as floats."
+
+SNAPSHOTS = dict()
+"account key -> AccountSnapshot"
+
+SNAPSHOTS_LOCK = threading.Lock()
+
+
+def account_key(exchange):
+    "Identify the account behind an exchange client."
+    return getattr(exchange, 'API_KEY', None) or id(exchange)
+
+
+class AccountSnapshot:
+    """The balances of one account.
+
+    Args:
+        exchange: the account's client.
+        ttl (float): seconds before the balances are fetched again.
+            None keeps them until `refresh`.
+        clock (callable): returns the current time in seconds.
+    """
+
+    def __init__(self, exchange, ttl=None, clock=time.time):
+        self.exchange = exchange
+        self.ttl = ttl
+        self.clock = clock
+        self.fetched_at = None
+        self._balances = None
+        self.lock = threading.Lock()
+
+    @property
+    def stale(self):
+        if self._balances is None:
+            return True
+        return self.ttl is not None and self.clock() - self.fetched_at >= self.ttl
+
+    def refresh(self):
+        "Fetch the balances now, e.g. after placing or cancelling orders."
+        account = self.exchange.get_account()
+        balances = {
+            balance['asset']: Balance(
+                balance['asset'], float(balance['free']),
+                float(balance['locked']))
+            for balance in account['balances']
+        }
+        with self.lock:
+            self._balances = balances
+            self.fetched_at = self.clock()
+
+    def invalidate(self):
+        "Fetch the balances again on next use."
+        with self.lock:
+            self._balances = None
+
+    @property
+    def balances(self):
+        """Every asset's balance.
+
+        Returns:
+            dict: asset -> Balance
+        """
+        if self.stale:
+            self.refresh()
+        return self._balances
+
+    def get(self, asset):
+        "The balance of `asset`, zero if the account holds none."
+        return self.balances.get(asset) or Balance(asset, 0.0, 0.0)
+
+
+def snapshot_for(exchange, ttl=ACCOUNT_TTL):
+    "The shared snapshot of the account behind `exchange`."
+    key = account_key(exchange)
+    with SNAPSHOTS_LOCK:
+        snapshot = SNAPSHOTS.get(key)
+        if snapshot is None:
+            snapshot = SNAPSHOTS[key] = AccountSnapshot(exchange, ttl)
+    return snapshot
+
+
+def forget(exchange):
+    "Invalidate the shared snapshot of an account after its orders changed."
+    with SNAPSHOTS_LOCK:
+        snapshot = SNAPSHOTS.get(account_key(exchange))
+    if snapshot is not None:
+        snapshot.invalidate()
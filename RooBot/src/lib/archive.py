@@ -0,0 +1,105 @@
+"""Keep an append-only history of every market download.
+
+Every `invoke download` appends its tickers to a gzip-compressed,
+newline-delimited JSON (NDJSON) file in `tmp/archive`, one file per day.
+Each line is one ticker as returned by Binance plus a `taken_at` field.
+Every append is its own gzip member, which `gzip` reads back as one stream,
+so nothing already on disk is ever rewritten.
+
+Reading is lazy: `records` and `snapshots` are generators that decompress
+one line at a time, so a backtest can replay months of history without
+loading it into memory.
+
+Example:
+
+        for taken_at, tickers in archive.snapshots(start=date(2018, 1, 1)):
+            ...
+"""
+
+# core
+from datetime import datetime
+import glob
+import gzip
+import itertools
+import json
+import os
+
+ARCHIVE_DIR = "tmp/archive"
+
+FILE_PREFIX = "markets-"
+FILE_SUFFIX = ".ndjson.gz"
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def path_for(day):
+    "The archive file that holds the downloads made on `day`."
+    return os.path.join(
+        ARCHIVE_DIR, "{}{:%Y-%m-%d}{}".format(FILE_PREFIX, day, FILE_SUFFIX))
+
+
+def day_of(path):
+    "The date an archive file covers, parsed from its name."
+    name = os.path.basename(path)[len(FILE_PREFIX):-len(FILE_SUFFIX)]
+    return datetime.strptime(name, '%Y-%m-%d').date()
+
+
+def append(tickers, taken_at=None):
+    """Append one download to the archive.
+
+    Args:
+        tickers (iterable): the ticker dicts returned by the exchange.
+        taken_at (datetime): when the tickers were sampled. Defaults to now.
+
+    Returns:
+        int: the number of tickers written.
+    """
+    taken_at = taken_at or datetime.now()
+    stamp = taken_at.strftime(TIMESTAMP_FORMAT)
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+    count = 0
+    with gzip.open(path_for(taken_at), 'at') as archive_file:
+        for ticker in tickers:
+            record = dict(ticker, taken_at=stamp)
+            archive_file.write(json.dumps(record, separators=(',', ':')))
+            archive_file.write('\n')
+            count += 1
+
+    return count
+
+
+def records(start=None, end=None):
+    """Lazily yield archived tickers in the order they were written.
+
+    Args:
+        start (date): skip files for days before this one.
+        end (date): skip files for days after this one.
+
+    Yields:
+        dict: one ticker, including its `taken_at` string.
+    """
+    pattern = os.path.join(ARCHIVE_DIR, FILE_PREFIX + '*' + FILE_SUFFIX)
+    for path in sorted(glob.glob(pattern)):
+        day = day_of(path)
+        if start and day < start:
+            continue
+        if end and day > end:
+            continue
+
+        with gzip.open(path, 'rt') as archive_file:
+            for line in archive_file:
+                yield json.loads(line)
+
+
+def snapshots(start=None, end=None):
+    """Lazily yield archived downloads one at a time.
+
+    Yields:
+        tuple: (taken_at datetime, list of ticker dicts)
+    """
+    grouped = itertools.groupby(
+        records(start, end), key=lambda record: record['taken_at'])
+    for stamp, tickers in grouped:
+        yield datetime.strptime(stamp, TIMESTAMP_FORMAT), list(tickers)
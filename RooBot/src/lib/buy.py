@@ -1,423 +1,575 @@
-"""Perform purchases of coins based on technical analysis.
-
-Example:
-
-        shell> invoke buy
-
-`src/tasks.py` has a buy task that will call main of this module.
-
-Todo:
-    * This module is perfect. Are you kidding me?
-
-"""
-#Changed by AJV 01/23/2018
-
-# core
-import collections
-import json
-import logging
-import pprint
-
-# 3rd party
-import argh
-from retry import retry
-from supycache import supycache
-#from bittrex.bittrex import SELL_ORDERBOOK
-
-# local
-import lib.config
-from .db import db
-from . import mybinance
-
-LOGGER = logging.getLogger(__name__)
-"""TODO: move print statements to logging"""
-
-
-SYS_INI = lib.config.System()
-
-IGNORE_BY_IN = SYS_INI.ignore_markets_by_in
-"Coins we wish to avoid"
-
-IGNORE_BY_FIND = SYS_INI.ignore_markets_by_find
-"We do not trade ETH or USDT based markets"
-
-
-MAX_ORDERS_PER_MARKET = SYS_INI.max_open_trades_per_market
-"""The maximum number of purchases of a coin we will have open sell orders for
-is 3. Sometimes a coin will surge on the hour, but drop on the day or week.
-And then surge again on the hour, while dropping on the longer time charts.
-We do not want to suicide our account by continually chasing a coin with this
-chart pattern. MANA did this for a long time before recovering. But we dont
-need that much risk."""
-
-MIN_PRICE = SYS_INI.min_price
-"""The coin must cost 100 sats or more because any percentage markup for a
-cheaper coin will not lead to a change in price."""
-
-MIN_VOLUME = SYS_INI.min_volume
-"Must have at least a certain amount of BTC in transactions over last 24 hours"
-
-MIN_GAIN = SYS_INI.min_gain
-"1-hour gain must be 5% or more"
-
-#TODO Fix this
-@retry(exceptions=json.decoder.JSONDecodeError, tries=600, delay=5)
-def number_of_open_orders_in(openorders, market):
-    """Maximum number of unclosed SELL LIMIT orders for a coin.
-
-    RooBot detects hourly surges. On occasion the hourly surge is part
-    of a longer downtrend, leading RooBot to buy on surges that do not
-    close. We do not want to keep buying false surges so we limit ourselves to
-    3 open orders on any one coin.
-
-    Args:
-        exchange (int): The exchange object.
-        market (str): The coin.
-
-    Returns:
-        int: The number of open orders for a particular coin.
-
-    """
-    orders = list()
-    open_orders_list = openorders['result']
-    if open_orders_list:
-        for order in open_orders_list:
-            if order['Exchange'] == market:
-                orders.append(order)
-
-    return len(orders)
-
-
-def percent_gain(new, old):
-    """The percentage increase from old to new.
-
-    Returns:
-        float: percentage increase [0.0,100.0]
-    """
-    gain = (new - old) / old
-    gain *= 100
-    return gain
-
-#Changed by AJV 01/22/2018
-def obtain_btc_balance(exchange):
-    """Get BTC balance.
-
-    Returns:
-        dict: The account's balance of BTC.
-    """
-    bal = exchange.get_asset_balance('BTC')
-    return bal['result']
-
-
-#Changed by AJV 01/22/2018
-def available_btc(exchange):
-    """Get BTC balance.
-
-    Returns:
-        float: The account's balance of BTC.
-    """
-    bal = obtain_btc_balance(exchange)
-    avail = bal['free']
-    print("\tAvailable btc={0}".format(avail))
-    return avail
-
-
-def record_buy(config_file, order_id, market, rate, amount):
-    """Store the details of a coin purchase.
-
-    Create a new record in the `buy` table.
-
-    Returns:
-        Nothing
-    """
-    db.buy.insert(
-        config_file=config_file,
-        order_id=order_id, market=market, purchase_price=rate, amount=amount)
-    db.commit()
-
-#TODO: Make sure that the indexes match and it returns the right rate
-#Changed by AJV 01/23/2018
-def rate_for(exchange, market, btc):
-    "Return the rate that allows you to spend a particular amount of BTC."
-
-    coin_amount = 0
-    btc_spent = 0
-    orders = exchange.get_order_book(symbol = market, limit = 1000)
-    for order in orders['asks']:
-        btc_spent += order[0] * order[1]
-        if btc_spent > 1.4* btc:
-            coin_amount = btc / order[0]
-            return order[0], coin_amount
-    return 0
-
-
-def percent2ratio(percentage):
-    """Convert a percentage to a float.
-
-    Example:
-        if percentage == 5, then return 5/100.0:
-
-    """
-    return percentage / 100.0
-
-
-def calculate_trade_size(user_config):
-    """How much BTC to allocate to a trade.
-
-    Given the seed deposit and the percentage of the seed to allocate to each
-    trade.
-
-    Returns:
-        float : the amount of BTC to spend on trade.
-    """
-
-    holdings = user_config.trade_deposit
-    trade_ratio = percent2ratio(user_config.trade_trade)
-
-    return holdings * trade_ratio
-
-
-def get_trade_size(user_config, btc):
-    "Determine how much BTC to spend on a buy."
-
-    # Do not trade if we are configured to accumulate btc
-    # (presumably for withdrawing a percentage for profits)
-    if btc <= user_config.trade_preserve:
-        print("BTC balance <= amount to preserve")
-        return 0
-
-    # If we have more BTC than the size of each trade, then
-    # make a trade of that size
-    trade_size = calculate_trade_size(user_config)
-    print("\tTrade size   ={}".format(trade_size))
-    if btc >= trade_size:
-        return trade_size
-
-    # Otherwise do not trade
-    return 0
-
-#Changed by AJV 01/23/2018
-def fee_adjust(btc, exchange):
-    """The amount of BTC that can be spent on coins sans fees.
-
-    For instance if you want to spend 0.03BTC per trade, but the exchange charges 0.25% per trade,
-    then you can spend 0.03 -  0.03 * 0.0025 instead of 0.03
-    """
-
-    #Changed exchange fee AJV 01/23/2018
-    exchange_fee = 0.05 # 0.05% on Binance
-    print("Adjusting {} trade size to respect {}% exchange fee on {}".format(
-        btc, exchange_fee, exchange))
-
-    exchange_fee /= 100.0
-
-    adjusted_spend = btc - btc * exchange_fee
-    return adjusted_spend
-
-
-#Changed by AJV 01/23/2018
-def _buycoin(config_file, user_config, exchange, market, btc):
-    "Buy into market using BTC."
-
-    size = get_trade_size(user_config, btc)
-
-    if not size:
-        print("No trade size. Returning.")
-        return
-    else:
-        size = fee_adjust(size, exchange)
-
-    print("I will trade {0} BTC.".format(size))
-
-    rate, amount_of_coin = rate_for(exchange, market, size)
-
-    print("I get {0} units of {1} at the rate of {2:.8f} BTC per coin.".format(
-        amount_of_coin, market, rate))
-
-    #TODO Critical This handles the buying. Make sure this works.
-    result = exchange.order_limit_buy(symbol = market, quantity = amount_of_coin, price = rate)
-    #Changed by AJV 01/23/2018
-    #check to see if the following condition works
-    #Replace FILLED with constant from client
-    if result['status'] == "FILLED":
-        print("\tBuy was a success = {}".format(result))
-        record_buy(config_file, result['orderId'], market, rate, amount_of_coin)
-    else:
-        print("\tBuy FAILED: {}".format(result))
-
-
-def buycoin(config_file, user_config, exchange, top_coins):
-    "Buy top N cryptocurrencies."
-
-    avail = available_btc(exchange)
-
-    for market in top_coins:
-        _buycoin(config_file, user_config, exchange, market[0], avail)
-
-
-@supycache(cache_key='result')
-def analyze_gain(exchange):
-    """Find the increase in coin price.
-
-    The market database table stores the current ask price of all coins.
-    Every hour `invoke download` creates another row in this table. Then when
-    `invoke buy` gets to the analyze_gain function, analyze_gain pulls the 2
-    most recent rows from market and subtracts the ask prices to determine the
-    1-hour price gain.
-
-    Returns:
-        list : A list of 5-tuples of this form
-           (
-                name,  # the market name, e.g. "BTC-NEO"
-                percent_gain(row[0].ask, row[1].ask), # 1-hour price gain
-                row[1].ask, # price this hour
-                row[0].ask, # prince 1 hour ago
-                'https://bittrex.com/Market/Index?MarketName={0}'.format(name),
-            )
-    """
-    def should_skip(name):
-        """Decide if a coin should be part of surge analysis.
-
-        IGNORE_BY_IN filters out coins that I do not trust.
-        IGNORE_BY_FIND filters out markets that are not BTC-based.
-          E.g: ETH and USDT markets.
-        """
-        for ignorable in IGNORE_BY_IN:
-            if ignorable in name:
-                print("\tIgnoring {} because {} is in({}).".format(
-                    name, ignorable, IGNORE_BY_IN))
-                return True
-
-        for ignore_string in IGNORE_BY_FIND:
-            if name.find(ignore_string) > -1:
-                print('\tIgnore by find: ' + name)
-                return True
-
-        return False
-
-    def get_recent_market_data():
-        """Get price data for the 2 time points.
-
-        RooBot detects changes in coin price. To do so, it subtracts the
-        price of the coin at one point in time versus another point in time.
-        This function gets the price data for 2 points in time so the difference
-        can be calculated.
-        """
-        #TODO Should I update this procedure to check more regularly?
-        retval = collections.defaultdict(list)
-
-        for row in db().select(db.market.ALL, groupby=db.market.name):
-            for market_row in db(db.market.name == row.name).select(
-                    db.market.ALL,
-                    orderby=~db.market.timestamp,
-                    limitby=(0, 2)
-            ):
-                retval[market_row.name].append(market_row)
-
-        return retval
-
-    markets = exchange.get_market_summaries(by_market=True)
-    recent = get_recent_market_data()
-
-    openorders = exchange.get_open_orders()
-
-    print("<ANALYZE_GAIN numberofmarkets={0}>".format(len(list(recent.keys()))))
-
-    gain = list()
-
-    for name, row in recent.items():
-
-        print("Analysing {}...".format(name))
-
-        if len(row) != 2:
-            print("\t2 entries for market required. Perhaps this is the first run?")
-            continue
-
-        if should_skip(name):
-            continue
-
-        try:
-            if markets[name]['BaseVolume'] < MIN_VOLUME:
-                print("\t{} 24hr vol < {}".format(markets[name], MIN_VOLUME))
-                continue
-        except KeyError:
-            print("\tKeyError locating {}".format(name))
-            continue
-
-        if number_of_open_orders_in(openorders, name) >= MAX_ORDERS_PER_MARKET:
-            print('\tToo many open orders: ' + name)
-            continue
-
-        if row[0].ask < MIN_PRICE:
-            print('\t{} costs less than {}.'.format(name, MIN_PRICE))
-            continue
-
-        gain.append(
-            (
-                name,
-                percent_gain(row[0].ask, row[1].ask),
-                row[1].ask,
-                row[0].ask,
-                'https://bittrex.com/Market/Index?MarketName={0}'.format(name),
-            )
-        )
-
-    print("</ANALYZE_GAIN>")
-
-    gain = sorted(gain, key=lambda r: r[1], reverse=True)
-    return gain
-
-
-def topcoins(exchange, number_of_coins):
-    """Find the coins with the greatest change in price.
-
-    Calculate the gain of all BTC-based markets. A market is where
-    one coin is exchanged for another, e.g: BTC-XRP.
-
-    #TODO Think through the Criteria
-    Markets must meet certain criteria:
-        * 24-hr volume of MIN_VOLUME
-        * price gain of MIN_GAIN
-        * BTC-based market only
-        * Not filtered out because of should_skip()
-        * Cost is 125 satoshis or more
-
-    Returns:
-        list : the markets which are surging.
-    """
-    top = analyze_gain(exchange)
-
-    # print 'TOP: {}.. now filtering'.format(top[:10])
-    top = [t for t in top if t[1] >= MIN_GAIN]
-    # print 'TOP filtered on MIN_GAIN : {}'.format(top)
-
-
-    print("Top 5 coins filtered on %gain={} and volume={}:\n{}".format(
-        MIN_GAIN,
-        MIN_VOLUME,
-        pprint.pformat(top[:5], indent=4)))
-
-    return top[:number_of_coins]
-
-
-def process(config_file):
-    """Buy coins for every configured user of the bot."""
-    user_config = lib.config.User(config_file)
-
-    exchange = mybinance.make_binance(user_config.config)
-
-    top_coins = topcoins(exchange, user_config.trade_top)
-
-    print("------------------------------------------------------------")
-    print("Buying coins for: {}".format(config_file))
-    buycoin(config_file, user_config, exchange, top_coins)
-
-
-def main(inis):
-    """Buy coins for every configured user of the bot."""
-
-    for config_file in inis:
-        process(config_file)
-
-if __name__ == '__main__':
-    argh.dispatch_command(main)
+"""Perform purchases of coins based on technical analysis.
+
+Example:
+
+        shell> invoke buy
+
+`src/tasks.py` has a buy task that will call main of this module.
+
+Todo:
+    * This module is perfect. Are you kidding me?
+
+"""
+#Changed by AJV 01/23/2018
+
+# core
+import collections
+import json
+import logging
+import pprint
+import time
+
+# 3rd party
+import argh
+import numpy
+from retry import retry
+#from bittrex.bittrex import SELL_ORDERBOOK
+
+# local
+import lib.config
+from .db import db
+from . import account
+from . import ignore
+from . import mybinance
+from . import orderbook
+from . import scoring
+from . import snapshot
+from . import stats
+from . import workers
+
+LOGGER = logging.getLogger(__name__)
+"""TODO: move print statements to logging"""
+
+
+# The settings are read from `lib.config.system()` where they are used, so
+# a daemon or stream picks up an edited system.ini on its next run. The
+# meaning of each (per_market, min_price, ...) is documented on
+# `lib.config.System`.
+
+IGNORE = None
+"(System, MarketFilter) of the last `ignore_filter` call."
+
+
+def ignore_filter(sys_config):
+    """The `[ignore]` section of system.ini compiled into one matcher.
+
+    `coin` filters out coins that I do not trust.
+    `market` filters out markets that are not BTC-based.
+      E.g: ETH and USDT markets.
+
+    The matcher is compiled again only when system.ini was re-read.
+    """
+    global IGNORE
+    cached = IGNORE
+    if cached is None or cached[0] is not sys_config:
+        cached = IGNORE = (sys_config, ignore.MarketFilter.from_system(sys_config))
+    return cached[1]
+
+RECENT_MARKET_DATA_SQL = """
+SELECT id, name, ask, timestamp FROM (
+    SELECT id, name, ask, timestamp,
+           ROW_NUMBER() OVER (
+               PARTITION BY name ORDER BY timestamp DESC, id DESC
+           ) AS recency
+    FROM market
+) WHERE recency <= 2
+ORDER BY name, recency;
+"""
+"""The 2 most recent rows of every market, newest first, in a single query.
+
+Window functions need SQLite 3.25 or newer."""
+
+OPEN_ORDERS_TTL = 60
+"""Seconds an account's open order index is reused before it is fetched
+again. Every user processed by one `invoke buy` shares it."""
+
+OPEN_ORDER_INDEXES = dict()
+"API key -> (time fetched, Counter of open orders per symbol)"
+
+
+def index_open_orders(openorders):
+    """Count open orders per symbol.
+
+    Args:
+        openorders (list): orders as returned by `get_open_orders`.
+
+    Returns:
+        collections.Counter: symbol -> number of open orders.
+    """
+    if isinstance(openorders, dict):
+        # Bittrex wrapped its results.
+        openorders = openorders['result']
+
+    return collections.Counter(order['symbol'] for order in openorders or ())
+
+
+@retry(exceptions=json.decoder.JSONDecodeError, tries=600, delay=5)
+def open_order_index(exchange, ttl=OPEN_ORDERS_TTL):
+    """Fetch the account's open orders once and index them by symbol.
+
+    The index is cached per account for `ttl` seconds so that analysing
+    many markets, or many users of the same account, costs a single
+    `get_open_orders` call.
+
+    Returns:
+        collections.Counter: symbol -> number of open orders.
+    """
+    key = account.account_key(exchange)
+    cached = OPEN_ORDER_INDEXES.get(key)
+    if cached and time.time() - cached[0] < ttl:
+        return cached[1]
+
+    index = index_open_orders(exchange.get_open_orders())
+    OPEN_ORDER_INDEXES[key] = (time.time(), index)
+    return index
+
+
+def forget_open_orders(exchange):
+    "Drop the cached open order index after placing an order."
+    OPEN_ORDER_INDEXES.pop(account.account_key(exchange), None)
+
+
+def number_of_open_orders_in(index, market):
+    """Maximum number of unclosed SELL LIMIT orders for a coin.
+
+    RooBot detects hourly surges. On occasion the hourly surge is part
+    of a longer downtrend, leading RooBot to buy on surges that do not
+    close. We do not want to keep buying false surges so we limit ourselves to
+    3 open orders on any one coin.
+
+    Args:
+        index (collections.Counter): from `open_order_index`.
+        market (str): The coin.
+
+    Returns:
+        int: The number of open orders for a particular coin.
+
+    """
+    return index[market]
+
+
+def percent_gain(new, old):
+    """The percentage increase from old to new.
+
+    Returns:
+        float: percentage increase [0.0,100.0]
+    """
+    gain = (new - old) / old
+    gain *= 100
+    return gain
+
+#Changed by AJV 01/22/2018
+def obtain_btc_balance(exchange):
+    """Get BTC balance.
+
+    Balances come from the account's shared snapshot, so several buys in a
+    row cost one `get_account` call.
+
+    Returns:
+        account.Balance: The account's balance of BTC.
+    """
+    return account.snapshot_for(exchange).get('BTC')
+
+
+#Changed by AJV 01/22/2018
+def available_btc(exchange):
+    """Get BTC balance.
+
+    Returns:
+        float: The account's balance of BTC.
+    """
+    bal = obtain_btc_balance(exchange)
+    avail = bal.free
+    print("\tAvailable btc={0}".format(avail))
+    return avail
+
+
+def record_buy(config_file, order_id, market, rate, amount, status=None):
+    """Store the details of a coin purchase.
+
+    Create a new record in the `buy` table.
+
+    Returns:
+        Nothing
+    """
+    db.buy.insert(
+        config_file=config_file,
+        order_id=order_id, market=market, purchase_price=rate, amount=amount,
+        status=status)
+    db.commit()
+
+BOOK_HEADROOM = 1.4
+"""Price the buy as if spending this multiple of the trade size, so the limit
+order still fills if the book moves before it arrives."""
+
+
+#Changed by AJV 01/23/2018
+def rate_for(exchange, market, btc):
+    """Return the rate that allows you to spend a particular amount of BTC.
+
+    Returns:
+        tuple: (rate, amount of coin, orderbook.Fill) or None when the
+        order book is too thin.
+    """
+    fill = orderbook.fill_for(exchange, market, BOOK_HEADROOM * btc)
+    if fill is None:
+        return None
+
+    print("\tBook depth {}: vwap={:.8f} worst={:.8f} slippage={:.2f}%".format(
+        fill.depth, fill.vwap, fill.worst_price, fill.slippage))
+
+    coin_amount = btc / fill.worst_price
+    return fill.worst_price, coin_amount, fill
+
+
+def percent2ratio(percentage):
+    """Convert a percentage to a float.
+
+    Example:
+        if percentage == 5, then return 5/100.0:
+
+    """
+    return percentage / 100.0
+
+
+def calculate_trade_size(user_config):
+    """How much BTC to allocate to a trade.
+
+    Given the seed deposit and the percentage of the seed to allocate to each
+    trade.
+
+    Returns:
+        float : the amount of BTC to spend on trade.
+    """
+
+    holdings = user_config.trade_deposit
+    trade_ratio = percent2ratio(user_config.trade_trade)
+
+    return holdings * trade_ratio
+
+
+def get_trade_size(user_config, btc):
+    "Determine how much BTC to spend on a buy."
+
+    # Do not trade if we are configured to accumulate btc
+    # (presumably for withdrawing a percentage for profits)
+    if btc <= user_config.trade_preserve:
+        print("BTC balance <= amount to preserve")
+        return 0
+
+    # If we have more BTC than the size of each trade, then
+    # make a trade of that size
+    trade_size = calculate_trade_size(user_config)
+    print("\tTrade size   ={}".format(trade_size))
+    if btc >= trade_size:
+        return trade_size
+
+    # Otherwise do not trade
+    return 0
+
+#Changed by AJV 01/23/2018
+def fee_adjust(btc, exchange):
+    """The amount of BTC that can be spent on coins sans fees.
+
+    For instance if you want to spend 0.03BTC per trade, but the exchange charges 0.25% per trade,
+    then you can spend 0.03 -  0.03 * 0.0025 instead of 0.03
+    """
+
+    #Changed exchange fee AJV 01/23/2018
+    exchange_fee = 0.05 # 0.05% on Binance
+    print("Adjusting {} trade size to respect {}% exchange fee on {}".format(
+        btc, exchange_fee, exchange))
+
+    exchange_fee /= 100.0
+
+    adjusted_spend = btc - btc * exchange_fee
+    return adjusted_spend
+
+
+#Changed by AJV 01/23/2018
+def _buycoin(config_file, user_config, exchange, market, btc):
+    "Buy into market using BTC."
+
+    size = get_trade_size(user_config, btc)
+
+    if not size:
+        print("No trade size. Returning.")
+        return
+    else:
+        size = fee_adjust(size, exchange)
+
+    print("I will trade {0} BTC.".format(size))
+
+    rated = rate_for(exchange, market, size)
+    if rated is None:
+        print("Order book for {} too thin to spend {} BTC. Returning.".format(
+            market, size))
+        return
+    rate, amount_of_coin, _ = rated
+
+    print("I get {0} units of {1} at the rate of {2:.8f} BTC per coin.".format(
+        amount_of_coin, market, rate))
+
+    #TODO Critical This handles the buying. Make sure this works.
+    result = exchange.order_limit_buy(symbol = market, quantity = amount_of_coin, price = rate)
+    forget_open_orders(exchange)
+    account.forget(exchange)
+    # Record every placed buy. One that has not filled yet is sold by
+    # takeprofit (or userstream) once it does.
+    print("\tBuy placed = {}".format(result))
+    record_buy(config_file, result['orderId'], market, rate, amount_of_coin,
+               result['status'])
+
+
+def buycoin(config_file, user_config, exchange, top_coins):
+    "Buy top N cryptocurrencies."
+
+    avail = available_btc(exchange)
+
+    for market in top_coins:
+        _buycoin(config_file, user_config, exchange, market[0], avail)
+
+
+MarketAnalysis = collections.namedtuple(
+    'MarketAnalysis', 'names current previous volumes skip')
+"""Everything about the market that is the same for every user.
+
+names: market names; every array below is aligned on it.
+current, previous: the 2 most recent ask prices.
+volumes: 24 hour volumes, NaN when the exchange did not report one.
+skip: True for markets in the `[ignore]` section.
+"""
+
+
+def get_recent_market_data():
+    """Get price data for the 2 time points.
+
+    RooBot detects changes in coin price. To do so, it subtracts the
+    price of the coin at one point in time versus another point in time.
+    This function gets the price data for 2 points in time so the difference
+    can be calculated.
+
+    Returns:
+        tuple: (names, current asks, previous asks) where both asks are
+        float arrays aligned on names and NaN where a price is missing.
+    """
+    #TODO Should I update this procedure to check more regularly?
+
+    # Diff the 2 latest snapshots when we have them: two BLOBs instead
+    # of a row per market.
+    pair = snapshot.latest_pair()
+    if pair:
+        return pair
+
+    # One windowed scan over the (name, timestamp) index instead of a
+    # separate LIMIT 2 query per market.
+    retval = collections.OrderedDict()
+    rows = db.executesql(
+        RECENT_MARKET_DATA_SQL,
+        fields=[db.market.id, db.market.name, db.market.ask,
+                db.market.timestamp]
+    )
+    for market_row in rows:
+        retval.setdefault(market_row.name, []).append(market_row.ask)
+
+    names = list(retval)
+    current = numpy.full(len(names), numpy.nan)
+    previous = numpy.full(len(names), numpy.nan)
+    for i, asks in enumerate(retval.values()):
+        current[i] = asks[0]
+        if len(asks) == 2:
+            previous[i] = asks[1]
+
+    return names, current, previous
+
+
+def analyze_market(exchange):
+    """Gather the market-wide inputs of the surge analysis.
+
+    This is the part of `analyze_gain` that does not depend on the user,
+    so `main` runs it once per tick and shares it with every user.
+
+    Args:
+        exchange: any user's exchange object. Only public market data is
+            requested through it.
+
+    Returns:
+        MarketAnalysis
+    """
+    # The 24hr ticker of every symbol, in one call.
+    volume_of = {
+        ticker['symbol']: ticker['quoteVolume']
+        for ticker in exchange.get_ticker()
+    }
+    names, current, previous = get_recent_market_data()
+
+    volumes = numpy.array(
+        [volume_of.get(name, numpy.nan) for name in names], dtype=float)
+
+    return make_analysis(names, current, previous, volumes)
+
+
+def make_analysis(names, current, previous, volumes):
+    """Bundle aligned market arrays into a MarketAnalysis.
+
+    Markets in the `[ignore]` section, or without a name, are flagged in
+    `skip`.
+
+    Returns:
+        MarketAnalysis
+    """
+    sys_config = lib.config.system()
+    ignoring = ignore_filter(sys_config)
+    skip = ignoring.mask(names) | numpy.array(
+        [name is None for name in names], dtype=bool)
+    # `invoke stream` calls this every few seconds, so keep it off stdout.
+    LOGGER.debug("Ignoring %d markets matching %s",
+                 int(skip.sum()), ignoring.terms)
+
+    min_day_gain = sys_config.min_day_gain
+    if min_day_gain is not None:
+        market_stats = stats.load()
+        day_gain = market_stats.aligned(market_stats.returns(stats.DAY), names)
+        with numpy.errstate(invalid='ignore'):
+            falling = day_gain < min_day_gain
+        LOGGER.debug("Ignoring %d markets with 24hr change < %s%%",
+                     int(falling.sum()), min_day_gain)
+        skip = skip | falling
+
+    return MarketAnalysis(names, current, previous, volumes, skip)
+
+
+def analyze_gain(exchange, analysis=None):
+    """Find the increase in coin price.
+
+    The market database table stores the current ask price of all coins.
+    Every hour `invoke download` creates another row in this table. Then when
+    `invoke buy` gets to the analyze_gain function, analyze_gain pulls the 2
+    most recent rows from market and subtracts the ask prices to determine the
+    1-hour price gain.
+
+    The prices, volumes, open order counts and ignore flags are gathered
+    into arrays aligned on the market names, and `scoring.rank` filters
+    and sorts them in a few vectorized operations.
+
+    Args:
+        exchange: the exchange object of the user we are buying for. Its
+            open orders decide which markets are already at their cap.
+        analysis (MarketAnalysis): the shared market-wide inputs. Computed
+            with `analyze_market` when not provided.
+
+    Returns:
+        list : A list of 5-tuples of this form
+           (
+                name,  # the market name, e.g. "BTC-NEO"
+                percent_gain(row[0].ask, row[1].ask), # 1-hour price gain
+                row[1].ask, # price this hour
+                row[0].ask, # prince 1 hour ago
+                'https://bittrex.com/Market/Index?MarketName={0}'.format(name),
+            )
+    """
+    if analysis is None:
+        analysis = analyze_market(exchange)
+
+    names = analysis.names
+
+    openorders = open_order_index(exchange)
+
+    print("<ANALYZE_GAIN numberofmarkets={0}>".format(len(names)))
+
+    open_orders = numpy.array(
+        [number_of_open_orders_in(openorders, name) for name in names],
+        dtype=int)
+
+    sys_config = lib.config.system()
+    gain = scoring.rank(
+        names, analysis.current, analysis.previous, analysis.volumes,
+        open_orders, analysis.skip,
+        min_volume=sys_config.min_volume, min_price=sys_config.min_price,
+        max_orders=sys_config.max_open_trades_per_market)
+
+    print("\t{} of {} markets eligible".format(len(gain), len(names)))
+    print("</ANALYZE_GAIN>")
+
+    return gain
+
+
+def topcoins(exchange, number_of_coins, analysis=None):
+    """Find the coins with the greatest change in price.
+
+    Calculate the gain of all BTC-based markets. A market is where
+    one coin is exchanged for another, e.g: BTC-XRP.
+
+    #TODO Think through the Criteria
+    Markets must meet certain criteria:
+        * 24-hr volume of min_volume
+        * price gain of min_gain
+        * BTC-based market only
+        * Not filtered out by the `[ignore]` section
+        * Cost is 125 satoshis or more
+
+    Returns:
+        list : the markets which are surging.
+    """
+    top = analyze_gain(exchange, analysis)
+
+    # print 'TOP: {}.. now filtering'.format(top[:10])
+    sys_config = lib.config.system()
+    top = [t for t in top if t[1] >= sys_config.min_gain]
+    # print 'TOP filtered on MIN_GAIN : {}'.format(top)
+
+
+    print("Top 5 coins filtered on %gain={} and volume={}:\n{}".format(
+        sys_config.min_gain,
+        sys_config.min_volume,
+        pprint.pformat(top[:5], indent=4)))
+
+    return top[:number_of_coins]
+
+
+def process(config_file, analysis=None):
+    """Buy coins for one configured user of the bot.
+
+    Args:
+        config_file (str): the user's ini file.
+        analysis (MarketAnalysis): the market-wide analysis shared by all
+            users of this tick.
+    """
+    user_config = lib.config.user(config_file)
+
+    exchange = mybinance.make_binance(user_config.config)
+
+    top_coins = topcoins(exchange, user_config.trade_top, analysis)
+
+    print("------------------------------------------------------------")
+    print("Buying coins for: {}".format(config_file))
+    buycoin(config_file, user_config, exchange, top_coins)
+
+
+def main(inis, analysis=None):
+    """Buy coins for every configured user of the bot.
+
+    The market is analysed once with the first user's exchange object. Each
+    user then only applies their open order caps and trade size to it, up to
+    `[execution] workers` users at a time.
+
+    Args:
+        inis (list): the user ini files.
+        analysis (MarketAnalysis): use this instead of analysing the
+            downloaded market data, e.g. one built by `lib.stream`.
+    """
+    if not inis:
+        return
+
+    if analysis is None:
+        first_config = lib.config.user(inis[0])
+        analysis = analyze_market(mybinance.make_binance(first_config.config))
+
+    def _process(config_file):
+        process(config_file, analysis)
+
+    workers.for_each_user(
+        _process, inis, lib.config.system().execution_workers, label='buy')
+
+if __name__ == '__main__':
+    argh.dispatch_command(main)
@@ -1,119 +1,217 @@
-#Reviewed by AJV 01-28-2018
-# -*- coding: utf-8 -*-
-"""Provide object-oriented access to the ini files.
-
-RooBot uses a system.ini file and a user ini file. This module provides
-OO access to both.
-"""
-
-import configparser
-import random
-
-class System:
-
-    def __init__(self):
-        config = configparser.RawConfigParser()
-        with open("system.ini") as file_pointer:
-            #config.readfp(f)
-            config.read_file(file_pointer)
-        self.config = config
-
-    @property
-    def users_inis(self):
-        _ = self.config.get('users', 'inis').split()
-        return _
-
-    @property
-    def any_users_ini(self):
-        return random.choice(self.users_inis)
-
-    @property
-    def ignore_markets_by_in(self):
-        _ = self.config.get('ignore', 'coin').split()
-        return _
-
-    @property
-    def ignore_markets_by_find(self):
-        _ = self.config.get('ignore', 'market').split()
-        return _
-
-    @property
-    def max_open_trades_per_market(self):
-        _ = self.config.get('trade', 'per_market')
-        return int(_)
-
-    @property
-    def min_price(self):
-        _ = self.config.get('trade', 'min_price')
-        return float(_)
-
-    @property
-    def min_volume(self):
-        _ = self.config.get('trade', 'min_volume')
-        return float(_)
-
-    @property
-    def min_gain(self):
-        _ = self.config.get('trade', 'min_gain')
-        return float(_)
-
-    @property
-    def email_bcc(self):
-        _ = self.config.get('email', 'bcc')
-        return _
-
-    @property
-    def email_sender(self):
-        _ = self.config.get('email', 'sender')
-        return _
-
-
-class User(System):
-
-    def __init__(self, ini):
-        super().__init__()
-
-        config = configparser.RawConfigParser()
-        self.filename = "users/" + ini
-        self.basename = ini
-        with open(self.filename) as file_pointer:
-            #config.readfp(f)
-            config.read_file(file_pointer)
-
-        self.config = config
-        # print("USER CONFIG SECTIONS: {}".format(config._sections))
-
-
-
-    @property
-    def client_email(self):
-        _ = self.config.get('client', 'email')
-        return _
-
-    @property
-    def client_name(self):
-        _ = self.config.get('client', 'name')
-        return _
-
-    @property
-    def trade_deposit(self):
-        _ = self.config.get('trade', 'deposit')
-        return float(_)
-
-    @property
-    def trade_top(self):
-        _ = self.config.get('trade', 'top')
-        return int(_)
-
-    @property
-    def trade_preserve(self):
-        "Return the `preserve` param from the trade section of a user config file."
-
-        _ = self.config.get('trade', 'preserve')
-        return float(_)
-
-    @property
-    def trade_trade(self):
-        "Percentage of seed capital to trade."
-        _ = self.config.get('trade', 'trade')
-        return float(_)
\ No newline at end of file
+#Reviewed by AJV 01-28-2018
+# -*- coding: utf-8 -*-
+"""Provide object-oriented access to the ini files.
+
+RooBot uses a system.ini file and a user ini file. This module provides
+OO access to both.
+
+`system()` and `user(ini)` parse each file once per process and convert
+every setting to its type up front, into a frozen `System` or `User`.
+The result is cached by path and modification time, so asking again is a
+dictionary lookup. Editing an ini file is picked up on the next call, so
+callers ask at each use instead of keeping the object in a module global.
+(`invoke daemon` reads its own job intervals once, when it starts.)
+Missing required settings raise when the file is loaded, not deep inside
+a trade.
+"""
+
+import configparser
+import dataclasses
+import os
+import random
+import threading
+from typing import Optional
+
+SYSTEM_INI = "system.ini"
+USERS_DIR = "users/"
+
+CACHE = dict()
+"(kind, path) -> (mtime, loaded object)"
+
+CACHE_LOCK = threading.Lock()
+
+
+def parse(path):
+    "Parse an ini file without any caching."
+    config = configparser.RawConfigParser()
+    with open(path) as file_pointer:
+        config.read_file(file_pointer)
+    return config
+
+
+def _cached(kind, path, build):
+    "Build (or reuse) the object for `path`, rebuilding when the file changes."
+    mtime = os.path.getmtime(path)
+    key = (kind, path)
+    with CACHE_LOCK:
+        cached = CACHE.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    loaded = build(parse(path))
+    with CACHE_LOCK:
+        CACHE[key] = (mtime, loaded)
+    return loaded
+
+
+def forget():
+    "Drop every cached ini file."
+    with CACHE_LOCK:
+        CACHE.clear()
+
+
+def _words(config, section, option, fallback=None):
+    return tuple(config.get(section, option, fallback=fallback).split())
+
+
+@dataclasses.dataclass(frozen=True)
+class System:
+    "The settings of system.ini."
+
+    config: configparser.RawConfigParser = dataclasses.field(repr=False)
+    users_inis: tuple
+    ignore_markets_by_in: tuple
+    ignore_markets_by_find: tuple
+    max_open_trades_per_market: int
+    """The maximum number of purchases of a coin we will have open sell orders
+    for. Sometimes a coin will surge on the hour, but drop on the day or week.
+    And then surge again on the hour, while dropping on the longer time
+    charts. We do not want to suicide our account by continually chasing a
+    coin with this chart pattern. MANA did this for a long time before
+    recovering. But we dont need that much risk."""
+    min_price: float
+    """The coin must cost 100 sats or more because any percentage markup for
+    a cheaper coin will not lead to a change in price."""
+    min_volume: float
+    "Must have at least a certain amount of BTC in transactions over last 24 hours"
+    min_gain: float
+    "1-hour gain must be 5% or more"
+    min_day_gain: Optional[float]
+    """Lowest 24-hour percent change a coin may have, or None for no limit.
+    Catches coins that surge on the hour while dropping on the day."""
+    execution_workers: int
+    "How many users are processed at the same time."
+    download_market_rows: bool
+    "Also write one `market` row per symbol on every download."
+    daemon_intervals: dict
+    "job -> seconds between its runs under `invoke daemon`."
+    stream_url: str
+    "The ticker WebSocket stream `invoke stream` listens to."
+    stream_windows: tuple
+    "Seconds over which `invoke stream` tracks gains."
+    stream_window: int
+    "The window whose gain must reach min_gain to trigger a buy."
+    stream_evaluate: float
+    "Seconds between surge rankings of the stream."
+    stream_cooldown: float
+    "Seconds before a market that triggered buys may trigger them again."
+    stream_depth_symbols: int
+    "How many top-ranked markets get a live local order book."
+    email_bcc: str
+    email_sender: str
+    email_transport: dict
+    "marrow.mailer SMTP settings: host, port, username, password, tls."
+    email_background: bool
+    "Send email from a background thread instead of the caller."
+
+    @classmethod
+    def from_config(cls, config):
+        min_day_gain = config.get('trade', 'min_day_gain', fallback=None)
+        daemon_intervals = dict()
+        if config.has_section('daemon'):
+            daemon_intervals = {
+                job: float(seconds) for job, seconds in config.items('daemon')
+            }
+
+        return cls(
+            config=config,
+            users_inis=_words(config, 'users', 'inis'),
+            ignore_markets_by_in=_words(config, 'ignore', 'coin'),
+            ignore_markets_by_find=_words(config, 'ignore', 'market'),
+            max_open_trades_per_market=config.getint('trade', 'per_market'),
+            min_price=config.getfloat('trade', 'min_price'),
+            min_volume=config.getfloat('trade', 'min_volume'),
+            min_gain=config.getfloat('trade', 'min_gain'),
+            min_day_gain=None if min_day_gain is None else float(min_day_gain),
+            execution_workers=config.getint(
+                'execution', 'workers', fallback=1),
+            download_market_rows=config.getboolean(
+                'download', 'market_rows', fallback=False),
+            daemon_intervals=daemon_intervals,
+            stream_url=config.get(
+                'stream', 'url',
+                fallback='wss://stream.binance.com:9443/ws/!ticker@arr'),
+            stream_windows=tuple(
+                int(window) for window in
+                _words(config, 'stream', 'windows', fallback='300 900 3600')),
+            stream_window=config.getint('stream', 'window', fallback=3600),
+            stream_evaluate=config.getfloat(
+                'stream', 'evaluate', fallback=10),
+            stream_cooldown=config.getfloat(
+                'stream', 'cooldown', fallback=3600),
+            stream_depth_symbols=config.getint(
+                'stream', 'depth_symbols', fallback=0),
+            email_bcc=config.get('email', 'bcc'),
+            email_sender=config.get('email', 'sender'),
+            email_transport={
+                key: config.get('email', key)
+                for key in ('host', 'port', 'username', 'password', 'tls')
+                if config.has_option('email', key)
+            },
+            email_background=config.getboolean(
+                'email', 'background', fallback=False),
+        )
+
+    @property
+    def any_users_ini(self):
+        return random.choice(self.users_inis)
+
+    def daemon_interval(self, job, default):
+        "Seconds between runs of `job` under `invoke daemon`."
+        return self.daemon_intervals.get(job, float(default))
+
+
+@dataclasses.dataclass(frozen=True)
+class User:
+    "The settings of one user's ini file."
+
+    config: configparser.RawConfigParser = dataclasses.field(repr=False)
+    filename: str
+    basename: str
+    client_email: str
+    client_name: str
+    trade_deposit: float
+    trade_top: int
+    trade_preserve: float
+    "The `preserve` param from the trade section of a user config file."
+    trade_trade: float
+    "Percentage of seed capital to trade."
+    trade_takeprofit: float
+    "Percent gain at which bought coins are sold."
+
+    @classmethod
+    def from_config(cls, config, ini):
+        return cls(
+            config=config,
+            filename=USERS_DIR + ini,
+            basename=ini,
+            client_email=config.get('client', 'email'),
+            client_name=config.get('client', 'name'),
+            trade_deposit=config.getfloat('trade', 'deposit'),
+            trade_top=config.getint('trade', 'top'),
+            trade_preserve=config.getfloat('trade', 'preserve'),
+            trade_trade=config.getfloat('trade', 'trade'),
+            trade_takeprofit=config.getfloat('trade', 'takeprofit'),
+        )
+
+
+def system(path=SYSTEM_INI):
+    "The settings of system.ini, parsed once per process."
+    return _cached('system', path, System.from_config)
+
+
+def user(ini):
+    "The settings of `users/<ini>`, parsed once per process."
+    return _cached(
+        'user', USERS_DIR + ini,
+        lambda config: User.from_config(config, ini))
@@ -0,0 +1,117 @@
+"""Run RooBot's periodic tasks from one long-lived process.
+
+Under cron every `invoke download`, `invoke buy` and `invoke takeprofit` is a
+new process that re-imports pyDAL, reopens the database, re-reads the ini
+files and rebuilds its Binance clients, and nothing can run more often than
+once a minute. `invoke daemon` instead keeps all of that warm and runs each
+job on its own interval with a `Scheduler`.
+
+Jobs are aligned on multiples of their interval (an hourly job runs on the
+hour, a 5 minute job at :00, :05, ...). Jobs that fall due together run in
+the order they were given, so download runs before buy. A job that raises
+is reported and retried at its next slot; it never stops the daemon.
+"""
+
+# core
+import logging
+import time
+import traceback
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Job:
+    """A task to run every `interval` seconds.
+
+    Args:
+        name (str): shows up in the daemon's output.
+        interval (float): seconds between runs.
+        func (callable): called with no arguments.
+        now (float): the current time, used to schedule the first run.
+    """
+
+    def __init__(self, name, interval, func, now=None):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.runs = 0
+        self.failures = 0
+        self.next_run = self.slot_after(time.time() if now is None else now)
+
+    def __repr__(self):
+        return "Job({!r}, every {}s)".format(self.name, self.interval)
+
+    def slot_after(self, now):
+        "The first multiple of the interval that is not before `now`."
+        slots = -(-now // self.interval)
+        return slots * self.interval
+
+    def run(self, now):
+        """Run the job once and schedule its next slot.
+
+        Returns:
+            float: the seconds the job took.
+        """
+        started = time.time()
+        print("<{} at {}>".format(self.name, time.ctime(now)))
+        try:
+            self.func()
+        except Exception:
+            self.failures += 1
+            error_msg = traceback.format_exc()
+            print("{} failed:\n{}".format(self.name, error_msg))
+            LOGGER.error("%s failed:\n%s", self.name, error_msg)
+        self.runs += 1
+        elapsed = time.time() - started
+        print("</{} took {:.2f}s>".format(self.name, elapsed))
+
+        # Skip any slots missed while the job was running.
+        self.next_run = self.slot_after(now + elapsed + 1e-6)
+        return elapsed
+
+
+class Scheduler:
+    """Run jobs when they fall due.
+
+    Args:
+        jobs (list): `Job` objects, in the order ties should run.
+    """
+
+    def __init__(self, jobs, clock=time.time, sleep=time.sleep):
+        self.jobs = list(jobs)
+        self.clock = clock
+        self.sleep = sleep
+
+    def run_pending(self):
+        """Run every job that is due.
+
+        Returns:
+            list: the jobs that ran.
+        """
+        now = self.clock()
+        due = [job for job in self.jobs if job.next_run <= now]
+        for job in due:
+            job.run(now)
+        return due
+
+    def seconds_until_next(self):
+        "How long until the next job falls due."
+        next_run = min(job.next_run for job in self.jobs)
+        return max(0, next_run - self.clock())
+
+    def run_forever(self, iterations=None):
+        """Sleep until a job is due, run it, repeat.
+
+        Args:
+            iterations (int): stop after this many wake-ups. Runs forever
+                when None.
+        """
+        for job in self.jobs:
+            print("Scheduled {}; first run at {}".format(
+                job, time.ctime(job.next_run)))
+
+        count = 0
+        while iterations is None or count < iterations:
+            self.sleep(self.seconds_until_next())
+            self.run_pending()
+            count += 1
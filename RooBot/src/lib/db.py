@@ -1,38 +1,84 @@
-#Reviewed by AJV 01/23/2018
-"""Define the relational database schema.
-
-Todo:
-    * `db`, `market` and `buy` are invalid constant names. However capitalizing
-    them requires a lot of corrections throughout the code.
-"""
-
-# Core
-from datetime import datetime
-
-# 3rd Party
-from pydal import DAL, Field
-
-db = DAL('sqlite://storage.sqlite3')
-
-market = db.define_table(
-    'market',
-    Field('name'),
-    Field('ask', type='double'),
-    Field('timestamp', type='datetime', default=datetime.now)
-    )
-
-db.executesql('CREATE INDEX IF NOT EXISTS tidx ON market (timestamp);')
-db.executesql('CREATE INDEX IF NOT EXISTS m_n_idx ON market (name);')
-
-buy = db.define_table(
-    'buy',
-    Field('order_id'),
-    Field('config_file'),
-    Field('market'),
-    Field('purchase_price', type='double'),
-    Field('selling_price', type='double'),
-    Field('sell_id'),
-    Field('amount', type='double'),
-    Field('timestamp', type='datetime', default=datetime.now)
-    )
-db.executesql('CREATE INDEX IF NOT EXISTS sidx ON buy (selling_price);')
+#Reviewed by AJV 01/23/2018
+"""Define the relational database schema.
+
+Todo:
+    * `db`, `market` and `buy` are invalid constant names. However capitalizing
+    them requires a lot of corrections throughout the code.
+"""
+
+# Core
+from datetime import datetime
+
+# 3rd Party
+from pydal import DAL, Field
+
+db = DAL('sqlite://storage.sqlite3')
+
+market = db.define_table(
+    'market',
+    Field('name'),
+    Field('ask', type='double'),
+    Field('timestamp', type='datetime', default=datetime.now)
+    )
+
+db.executesql('CREATE INDEX IF NOT EXISTS tidx ON market (timestamp);')
+db.executesql('CREATE INDEX IF NOT EXISTS m_n_idx ON market (name);')
+db.executesql(
+    'CREATE INDEX IF NOT EXISTS m_n_t_idx ON market (name, timestamp);')
+
+buy = db.define_table(
+    'buy',
+    Field('order_id'),
+    Field('config_file'),
+    Field('market'),
+    Field('purchase_price', type='double'),
+    Field('selling_price', type='double'),
+    Field('sell_id'),
+    Field('amount', type='double'),
+    Field('timestamp', type='datetime', default=datetime.now),
+    Field('filled_at', type='datetime'),
+    Field('status'),
+    Field('claimed_at', type='datetime')
+    )
+db.executesql('CREATE INDEX IF NOT EXISTS sidx ON buy (selling_price);')
+
+symbol = db.define_table(
+    'symbol',
+    Field('name', unique=True)
+    )
+
+snapshot = db.define_table(
+    'snapshot',
+    Field('taken_at', type='datetime', default=datetime.now),
+    Field('source'),
+    Field('asks', type='blob'),
+    Field('volumes', type='blob')
+    )
+db.executesql('CREATE INDEX IF NOT EXISTS snap_t_idx ON snapshot (taken_at);')
+
+market_stats = db.define_table(
+    'market_stats',
+    Field('updated_at', type='datetime', default=datetime.now),
+    Field('state', type='blob')
+    )
+
+orders = db.define_table(
+    'orders',
+    Field('symbol'),
+    Field('order_id'),
+    Field('side'),
+    Field('status'),
+    Field('price', type='double'),
+    Field('orig_qty', type='double'),
+    Field('executed_qty', type='double'),
+    Field('quote_qty', type='double'),
+    Field('commission', type='double'),
+    Field('commission_asset'),
+    Field('commissions', type='text'),
+    Field('placed_at', type='datetime'),
+    Field('closed_at', type='datetime'),
+    Field('payload', type='text'),
+    Field('fetched_at', type='datetime', default=datetime.now)
+    )
+db.executesql(
+    'CREATE UNIQUE INDEX IF NOT EXISTS o_s_o_idx ON orders (symbol, order_id);')
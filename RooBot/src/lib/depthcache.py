@@ -0,0 +1,432 @@
+"""Keep live order books for a few symbols in memory.
+
+`_buycoin` fetches a REST order book right after a surge is found, which
+is exactly when latency matters. `DepthCache` instead follows Binance's
+documented protocol for a local order book, for the symbols most likely to
+be bought next:
+
+1. Open the `<symbol>@depth` diff stream and buffer its events.
+2. Fetch a REST snapshot with `get_order_book`.
+3. Drop buffered events whose final update id `u` is <= the snapshot's
+   `lastUpdateId`.
+4. The first event applied must span `lastUpdateId + 1`, and every later
+   event must start (`U`) right after the previous one ended (`u`).
+   Otherwise the book is out of sync and a new snapshot is fetched, off
+   the stream's thread.
+5. Each event holds absolute quantities per price level. A quantity of 0
+   removes the level.
+
+While a cache is active, `order_book` returns the book in the same shape
+as `get_order_book`, so `orderbook.fill_for` can price a buy without a
+network round trip.
+
+`replay` applies recorded snapshots and diff events without any network,
+and `DepthCache` can also listen to a `stream.ReplayServer`.
+"""
+
+# core
+import bisect
+import json
+import logging
+import queue
+import threading
+import time
+
+# local
+from . import stream
+
+LOGGER = logging.getLogger(__name__)
+
+STREAM_BASE = 'wss://stream.binance.com:9443'
+
+SNAPSHOT_LIMIT = 1000
+"Depth of the REST snapshot a book starts from."
+
+SNAPSHOT_RETRY = 1
+"Seconds to wait after a snapshot that did not line up. Doubles each time."
+
+SNAPSHOT_RETRY_MAX = 60
+"Longest wait between snapshots of one book."
+
+ACTIVE = None
+"The DepthCache started by `start`, if any."
+
+
+class Ladder:
+    """One side of a book, kept sorted best price first.
+
+    Args:
+        descending (bool): True for bids.
+    """
+
+    def __init__(self, descending=False):
+        self.descending = descending
+        self.keys = list()
+        "Sorted ascending. Bids are stored negated so the best comes first."
+        self.quantities = dict()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _key(self, price):
+        return -price if self.descending else price
+
+    def set(self, price, quantity):
+        "Set the quantity at a price level. 0 removes the level."
+        price, quantity = float(price), float(quantity)
+        key = self._key(price)
+        if quantity == 0:
+            if key in self.quantities:
+                del self.quantities[key]
+                del self.keys[bisect.bisect_left(self.keys, key)]
+            return
+
+        if key not in self.quantities:
+            bisect.insort(self.keys, key)
+        self.quantities[key] = quantity
+
+    def levels(self, limit=None):
+        "[price, quantity] pairs, best first."
+        keys = self.keys[:limit] if limit else self.keys
+        return [[self._key(key), self.quantities[key]] for key in keys]
+
+    def best(self):
+        "The best price, or None when the side is empty."
+        return self._key(self.keys[0]) if self.keys else None
+
+
+class LocalBook:
+    "The order book of one symbol, kept in sync from diff events."
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.lock = threading.RLock()
+        "Held while the book changes or is read, by DepthCache."
+        self.reset()
+
+    def reset(self):
+        "Forget everything and wait for a new snapshot."
+        self.bids = Ladder(descending=True)
+        self.asks = Ladder()
+        self.last_update_id = None
+        self.synced = False
+        self.pending = list()
+
+    @property
+    def ready(self):
+        return self.synced and self.last_update_id is not None
+
+    def load_snapshot(self, snapshot):
+        """Start from a REST snapshot and apply the buffered events.
+
+        Returns:
+            bool: False if the buffered events do not line up with the
+            snapshot and another snapshot is needed. The events stay
+            buffered for it.
+        """
+        pending = self.pending
+        self.reset()
+        for price, quantity in snapshot['bids']:
+            self.bids.set(price, quantity)
+        for price, quantity in snapshot['asks']:
+            self.asks.set(price, quantity)
+        self.last_update_id = snapshot['lastUpdateId']
+
+        for event in pending:
+            if not self.apply(event):
+                self.reset()
+                self.pending = pending
+                return False
+        return True
+
+    def apply(self, event):
+        """Apply one depth diff event.
+
+        Returns:
+            bool: False if the event shows the book is out of sync.
+        """
+        if self.last_update_id is None:
+            self.pending.append(event)
+            return True
+
+        if event['u'] <= self.last_update_id:
+            # Already contained in the snapshot.
+            return True
+
+        if not self.synced:
+            if event['U'] > self.last_update_id + 1:
+                return False
+            self.synced = True
+        elif event['U'] != self.last_update_id + 1:
+            self.synced = False
+            return False
+
+        for price, quantity in event['b']:
+            self.bids.set(price, quantity)
+        for price, quantity in event['a']:
+            self.asks.set(price, quantity)
+        self.last_update_id = event['u']
+        return True
+
+    def as_order_book(self, limit=None):
+        "The book in the shape `get_order_book` returns."
+        return {
+            'lastUpdateId': self.last_update_id,
+            'bids': self.bids.levels(limit),
+            'asks': self.asks.levels(limit),
+        }
+
+
+def replay(symbol, snapshots, events):
+    """Rebuild a book offline from recorded snapshots and diff events.
+
+    Args:
+        snapshots (iterable): REST snapshots. The next one is used each
+            time the book has to (re)sync.
+        events (iterable): depth diff events, oldest first.
+
+    Returns:
+        LocalBook
+    """
+    snapshots = iter(snapshots)
+    book = LocalBook(symbol)
+    for event in events:
+        if book.apply(event):
+            if book.last_update_id is not None:
+                continue
+            # First event buffered; fetch the starting snapshot.
+            if book.load_snapshot(next(snapshots)):
+                continue
+
+        # Out of sync: buffer this event and start over.
+        book.reset()
+        book.pending.append(event)
+        while not book.load_snapshot(next(snapshots)):
+            continue
+    return book
+
+
+class DepthCache:
+    """Local books for a changing set of symbols, fed by one stream.
+
+    The stream's callback only applies events, each under its book's
+    lock. Snapshots are fetched by a separate thread, which backs off
+    between attempts for a book that keeps failing to line up.
+
+    Args:
+        exchange: fetches the REST snapshots. Pass a client from
+            `mybinance.make_binance` so they count against the shared
+            request weight limit.
+        stream_base (str): STREAM_BASE or a replay server's address.
+    """
+
+    def __init__(self, exchange, stream_base=STREAM_BASE):
+        self.exchange = exchange
+        self.stream_base = stream_base
+        self.books = dict()
+        self.lock = threading.Lock()
+        "Guards `books`, `subscribed` and the socket."
+        self.socket = None
+        self.connected = False
+        self.subscribed = set()
+        "Symbols the open stream sends events for."
+        self.request_id = 0
+        self.thread = None
+        self.resyncs = queue.Queue()
+        "Books waiting for a snapshot."
+        self.snapshotter = threading.Thread(
+            target=self._fetch_snapshots, name='depth-snapshots', daemon=True)
+        self.snapshotter.start()
+
+    def url(self, symbols):
+        streams = '/'.join(
+            symbol.lower() + '@depth' for symbol in sorted(symbols))
+        return "{}/stream?streams={}".format(self.stream_base, streams)
+
+    def track(self, symbols):
+        """Follow exactly these symbols.
+
+        An open stream is retargeted with SUBSCRIBE and UNSUBSCRIBE
+        messages, so books that stay tracked keep their sync. A stream is
+        only (re)connected when none is open.
+        """
+        symbols = set(symbols)
+        with self.lock:
+            changed = symbols != set(self.books)
+            self.books = {
+                symbol: self.books.get(symbol) or LocalBook(symbol)
+                for symbol in symbols
+            }
+            connect = self.socket is None and bool(self.books)
+            if changed and self.connected:
+                self._subscribe()
+        if changed:
+            print("Tracking order books of {}".format(sorted(symbols)))
+        if connect:
+            self.restart()
+
+    def _send(self, method, symbols):
+        self.request_id += 1
+        self.socket.send(json.dumps({
+            'method': method,
+            'params': [symbol.lower() + '@depth' for symbol in sorted(symbols)],
+            'id': self.request_id,
+        }))
+
+    def _subscribe(self):
+        "Bring the open stream in line with `books`. Call with the lock held."
+        wanted = set(self.books)
+        dropped = self.subscribed - wanted
+        added = wanted - self.subscribed
+        if dropped:
+            self._send('UNSUBSCRIBE', dropped)
+        if added:
+            self._send('SUBSCRIBE', added)
+        self.subscribed = wanted
+
+    def _on_open(self, socket):
+        with self.lock:
+            if socket is not self.socket:
+                return
+            self.connected = True
+            # Symbols tracked while the connection was being opened.
+            self._subscribe()
+
+    def _desync(self):
+        """Mark every book stale; events were or will be missed.
+
+        Call with the lock held. `order_book` returns None for the books
+        until a snapshot and the events after it are applied again.
+        """
+        for book in self.books.values():
+            with book.lock:
+                book.reset()
+
+    def _on_close(self, socket, *_):
+        with self.lock:
+            if socket is self.socket:
+                self.socket = None
+                self.connected = False
+                self._desync()
+
+    def restart(self):
+        "Connect a new stream for the current symbols."
+        with self.lock:
+            if self.socket is not None:
+                self.socket.close()
+                self._desync()
+            self.socket = None
+            self.connected = False
+            if not self.books:
+                return
+
+            self.subscribed = set(self.books)
+            self.socket = stream.websocket.WebSocketApp(
+                self.url(self.subscribed), on_open=self._on_open,
+                on_message=self._on_message, on_close=self._on_close)
+            self.thread = threading.Thread(
+                target=self.socket.run_forever, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            if self.socket is not None:
+                self.socket.close()
+                self.socket = None
+            self.connected = False
+            self._desync()
+        self.resyncs.put(None)
+
+    def _snapshot(self, book):
+        return self.exchange.get_order_book(
+            symbol=book.symbol, limit=SNAPSHOT_LIMIT)
+
+    def _fetch_snapshots(self):
+        failures = dict()
+        "symbol -> snapshots in a row that did not line up"
+        while True:
+            book = self.resyncs.get()
+            if book is None:
+                return
+            with self.lock:
+                tracked = self.books.get(book.symbol) is book
+            if not tracked:
+                continue
+
+            delay = min(SNAPSHOT_RETRY * 2 ** failures.get(book.symbol, 0),
+                        SNAPSHOT_RETRY_MAX)
+            try:
+                snapshot = self._snapshot(book)
+            except Exception:
+                LOGGER.exception("Could not fetch the %s order book",
+                                 book.symbol)
+                loaded = False
+            else:
+                with book.lock:
+                    loaded = book.load_snapshot(snapshot)
+
+            if loaded:
+                failures.pop(book.symbol, None)
+                continue
+
+            failures[book.symbol] = failures.get(book.symbol, 0) + 1
+            time.sleep(delay)
+            self.resyncs.put(book)
+
+    def on_event(self, event):
+        "Apply one depth event, asking for a snapshot when one is needed."
+        with self.lock:
+            book = self.books.get(event.get('s'))
+        if book is None:
+            # Untracked, or the reply to a (UN)SUBSCRIBE.
+            return
+
+        with book.lock:
+            first = book.last_update_id is None and not book.pending
+            if not book.apply(event):
+                LOGGER.info("%s order book out of sync; resyncing", book.symbol)
+                book.reset()
+                book.pending.append(event)
+                first = True
+
+        if first:
+            self.resyncs.put(book)
+
+    def _on_message(self, _socket, message):
+        try:
+            payload = json.loads(message)
+            self.on_event(payload.get('data', payload))
+        except Exception:
+            LOGGER.exception("Failed to apply depth event")
+
+    def order_book(self, symbol, limit=None):
+        "The synced book of `symbol`, or None."
+        with self.lock:
+            book = self.books.get(symbol)
+        if book is None:
+            return None
+        with book.lock:
+            if not book.ready:
+                return None
+            return book.as_order_book(limit)
+
+
+def start(exchange, symbols, stream_base=STREAM_BASE):
+    """Start (or retarget) the process-wide depth cache.
+
+    Returns:
+        DepthCache
+    """
+    global ACTIVE
+    if ACTIVE is None:
+        ACTIVE = DepthCache(exchange, stream_base)
+    ACTIVE.track(symbols)
+    return ACTIVE
+
+
+def order_book(symbol, limit=None):
+    "The locally cached book of `symbol`, or None if it is not tracked."
+    if ACTIVE is None:
+        return None
+    return ACTIVE.order_book(symbol, limit)
+
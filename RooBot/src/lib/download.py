@@ -1,66 +1,130 @@
-#!/usr/bin/env python
-
-#Reviewed by AJV 01-28-2018
-#Changed by AJV 01-22-2018
-
-# Core
-from datetime import datetime
-import logging
-import pprint
-
-
-# 3rd Party
-import argh
-from retry import retry
-
-# Local
-from .db import db
-#from . import mybinance
-from . import mybinance
-
-logger = logging.getLogger(__name__)
-
-try:
-    import simplejson as json
-    try:
-        JSONDecodeError = json.JSONDecodeError
-    except AttributeError:
-        # simplejson < 2.1.0 does not have the JSONDecodeError exception class
-        JSONDecodeError = ValueError
-except ImportError:
-    import json
-    JSONDecodeError = ValueError
-
-
-@retry(exceptions=json.decoder.JSONDecodeError, tries=600, delay=5)
-
-def main(ini):
-
-    config_file = ini
-    from users import users
-
-    config = users.read(config_file)
-
-    #b = mybinance.make_binance(config)
-    b = mybinance.make_binance(config)
-
-
-    print("Getting market summaries")
-    markets = b.get_ticker()
-
-    with open("tmp/markets.json", "w") as markets_file:
-        markets_file.write(pprint.pformat(markets['result']))
-
-    print("Populating database")
-    for market in markets['result']:
-
-        db.market.insert(
-            name=market['symbol'],
-            ask=market['askPrice'],
-            timestamp=datetime.now()
-        )
-
-    db.commit()
-
-if __name__ == '__main__':
+#!/usr/bin/env python
+
+#Reviewed by AJV 01-28-2018
+#Changed by AJV 01-22-2018
+
+# Core
+from datetime import datetime
+import logging
+import time
+
+
+# 3rd Party
+import argh
+from retry import retry
+
+# Local
+import lib.config
+from .db import db
+#from . import mybinance
+from . import archive
+from . import mybinance
+from . import snapshot
+from . import stats
+
+logger = logging.getLogger(__name__)
+
+try:
+    import simplejson as json
+    try:
+        JSONDecodeError = json.JSONDecodeError
+    except AttributeError:
+        # simplejson < 2.1.0 does not have the JSONDecodeError exception class
+        JSONDecodeError = ValueError
+except ImportError:
+    import json
+    JSONDecodeError = ValueError
+
+
+INSERT_MARKET_SQL = 'INSERT INTO market (name, ask, timestamp) VALUES (?, ?, ?);'
+
+
+def ingest(markets, timestamp=None):
+    """Insert the ask price of every market in one transaction.
+
+    Going through `db.market.insert` costs a pyDAL round trip per row.
+    Binding all rows to a single prepared INSERT with `executemany` and
+    committing once lets SQLite update `tidx` and `m_n_idx` in one go.
+
+    Only the market rows share this transaction. The archive, snapshot and
+    statistics written by `main` each commit on their own.
+
+    Args:
+        markets (list): ticker dicts with `symbol` and `askPrice` keys.
+        timestamp (datetime): when the prices were sampled. Defaults to now.
+
+    Returns:
+        int: the number of rows inserted.
+    """
+    timestamp = (timestamp or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    rows = [
+        (market['symbol'], float(market['askPrice']), timestamp)
+        for market in markets
+    ]
+
+    # `db._adapter.cursor` only exists once this thread has run a query;
+    # asking for the connection opens it if needed.
+    cursor = db._adapter.connection.cursor()
+    try:
+        cursor.executemany(INSERT_MARKET_SQL, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return len(rows)
+
+
+@retry(exceptions=json.decoder.JSONDecodeError, tries=600, delay=5)
+
+def main(ini):
+
+    config_file = ini
+    from users import users
+
+    config = users.read(config_file)
+
+    #b = mybinance.make_binance(config)
+    b = mybinance.make_binance(config)
+
+
+    print("Getting market summaries")
+    # python-binance returns the 24hr ticker of every symbol as a list.
+    markets = b.get_ticker()
+    taken_at = datetime.now()
+
+    # Time every write of the download, so cron logs show what it costs.
+    timings = list()
+
+    print("Archiving market summaries")
+    started = time.time()
+    archive.append(markets, taken_at)
+    timings.append(('archive', time.time() - started))
+
+    if lib.config.system().download_market_rows:
+        print("Populating market table")
+        started = time.time()
+        ingest(markets, taken_at)
+        timings.append(('market rows', time.time() - started))
+
+    print("Recording snapshot")
+    started = time.time()
+    snapshot.record(
+        asks={market['symbol']: market['askPrice'] for market in markets},
+        volumes={market['symbol']: market['quoteVolume'] for market in markets},
+        taken_at=taken_at
+    )
+    timings.append(('snapshot', time.time() - started))
+
+    summary = "Ingested {} tickers in {:.3f}s ({})".format(
+        len(markets), sum(elapsed for _, elapsed in timings),
+        ", ".join("{} {:.3f}s".format(step, elapsed)
+                  for step, elapsed in timings))
+    print(summary)
+    logger.info(summary)
+
+    print("Updating rolling market statistics")
+    stats.update_from_latest()
+
+if __name__ == '__main__':
     argh.dispatch_command(main)
\ No newline at end of file
@@ -1,43 +1,192 @@
-#Reviewed by AJV 01-28-2018
-from marrow.mailer import Mailer, Message
-
-"""
-cbjewelz got this working:
-
- i did get it working with gmail though, i made the settings:
-    mailer = Mailer(
-        dict(
-            transport=dict(
-                use='smtp',
-                host='smtp.gmail.com',
-                port = '587',
-                username = 'email',
-                password = 'password',
-                tls = 'required')))
-
-    you have to create a special App password through google if you have 2FA enabled
-"""
-
-def send(subject, text, html, sender, recipient, cc=None, bcc=None):
-
-    mailer = Mailer(
-        dict(
-            transport=dict(
-                use='smtp',
-                host='localhost')))
-
-    mailer.start()
-
-    message = Message(
-        author=sender,
-        to=recipient,
-        cc=cc,
-        bcc=bcc
-    )
-
-    message.subject = subject
-    message.rich = html
-    message.plain = text
-
-    mailer.send(message)
-    mailer.stop()
+#Reviewed by AJV 01-28-2018
+"""Send email through one SMTP connection kept open for the whole process.
+
+cbjewelz got this working:
+
+ i did get it working with gmail though, i made the settings:
+    mailer = Mailer(
+        dict(
+            transport=dict(
+                use='smtp',
+                host='smtp.gmail.com',
+                port = '587',
+                username = 'email',
+                password = 'password',
+                tls = 'required')))
+
+    you have to create a special App password through google if you have 2FA enabled
+
+Those transport settings go in the `[email]` section of system.ini.
+
+`send` no longer starts and stops a Mailer per message. Messages are put
+in the outbox of a shared `Postman`, and `flush` delivers everything queued
+over the same started Mailer, whose SMTP connection stays open between
+messages. With `background = true` a worker thread delivers the outbox as
+it fills, so report generation never waits on SMTP. `flush` then waits for
+the outbox to drain.
+
+A local debugging server is enough to try it:
+
+    shell> python -m smtpd -n -c DebuggingServer localhost:1025
+"""
+
+# core
+import atexit
+import logging
+import queue
+import threading
+
+# 3rd party
+from marrow.mailer import Mailer, Message
+
+LOGGER = logging.getLogger(__name__)
+
+MAX_MESSAGES_PER_CONNECTION = 100
+"Reconnect after this many messages, as some servers cap a session."
+
+POSTMAN = None
+"The process-wide Postman, built on first use."
+
+POSTMAN_LOCK = threading.Lock()
+
+
+def message(subject, text, html, sender, recipient, cc=None, bcc=None):
+    """Build a message.
+
+    Every bcc address is an envelope recipient of the same message, so the
+    fan-out costs no extra SMTP transaction.
+    """
+    _message = Message(
+        author=sender,
+        to=recipient,
+        cc=cc,
+        bcc=bcc
+    )
+
+    _message.subject = subject
+    _message.rich = html
+    _message.plain = text
+    return _message
+
+
+class Postman:
+    """A started Mailer and an outbox of messages waiting for it.
+
+    Args:
+        transport (dict): marrow.mailer transport settings.
+        background (bool): deliver from a worker thread.
+    """
+
+    def __init__(self, transport=None, background=False):
+        self.transport = dict(
+            use='smtp', host='localhost',
+            max_messages_per_connection=MAX_MESSAGES_PER_CONNECTION)
+        self.transport.update(transport or {})
+        self.mailer = None
+        self.outbox = queue.Queue()
+        self.lock = threading.Lock()
+        "One SMTP conversation at a time."
+        self.worker = None
+        if background:
+            self.worker = threading.Thread(
+                target=self._work, name='postman', daemon=True)
+            self.worker.start()
+
+    def _deliver(self, _message):
+        with self.lock:
+            if self.mailer is None:
+                self.mailer = Mailer(dict(
+                    transport=self.transport, manager=dict(use='immediate')))
+                self.mailer.start()
+            self.mailer.send(_message)
+
+    def _work(self):
+        while True:
+            _message = self.outbox.get()
+            try:
+                if _message is None:
+                    return
+                self._deliver(_message)
+            except Exception:
+                LOGGER.exception("Could not send %s", _message.subject)
+            finally:
+                self.outbox.task_done()
+
+    def post(self, _message):
+        "Queue a message for the next flush, or the worker."
+        self.outbox.put(_message)
+
+    def flush(self):
+        """Deliver every queued message over the open connection.
+
+        With a worker, wait until it has delivered them instead.
+
+        Returns:
+            int: the number of messages this call delivered.
+        """
+        if self.worker is not None:
+            self.outbox.join()
+            return 0
+
+        sent = 0
+        while True:
+            try:
+                _message = self.outbox.get_nowait()
+            except queue.Empty:
+                return sent
+            try:
+                self._deliver(_message)
+                sent += 1
+            finally:
+                self.outbox.task_done()
+
+    def stop(self):
+        "Deliver what is queued, then close the connection."
+        self.flush()
+        if self.worker is not None:
+            self.outbox.put(None)
+            self.worker.join()
+            self.worker = None
+        with self.lock:
+            if self.mailer is not None:
+                self.mailer.stop()
+                self.mailer = None
+
+
+def postman():
+    "The shared Postman, configured from the `[email]` section of system.ini."
+    global POSTMAN
+    with POSTMAN_LOCK:
+        if POSTMAN is None:
+            import lib.config
+            sys_config = lib.config.system()
+            POSTMAN = Postman(
+                sys_config.email_transport, sys_config.email_background)
+            atexit.register(POSTMAN.stop)
+        return POSTMAN
+
+
+def queue_message(subject, text, html, sender, recipient, cc=None, bcc=None):
+    "Queue a message; it goes out on the next `flush`."
+    postman().post(message(subject, text, html, sender, recipient, cc, bcc))
+
+
+def flush():
+    """Deliver every queued message.
+
+    Nothing was queued if the Postman was never built, so no Postman (and
+    no SMTP connection) is made just to flush it.
+    """
+    if POSTMAN is None:
+        return 0
+    return POSTMAN.flush()
+
+
+def send(subject, text, html, sender, recipient, cc=None, bcc=None):
+    """Send a message over the shared connection.
+
+    In background mode this only queues the message.
+    """
+    queue_message(subject, text, html, sender, recipient, cc, bcc)
+    if postman().worker is None:
+        flush()
@@ -0,0 +1,92 @@
+"""Decide which markets RooBot should leave alone.
+
+The ignore lists in `system.ini` and the markets skipped by a profit report
+are lists of substrings.
+`MarketFilter` compiles such a list into one regular expression once, and
+`mask` classifies a whole list of symbols with a single scan.
+
+Example:
+
+        IGNORE = MarketFilter.from_system(lib.config.system())
+        skip = IGNORE.mask(names)
+"""
+
+# core
+import bisect
+import re
+
+# 3rd party
+import numpy
+
+SEPARATOR = '\n'
+"Joins symbols for the single-pass scan. No symbol or term contains it."
+
+
+class MarketFilter:
+    """Match market or coin names against a list of substrings.
+
+    Args:
+        terms (iterable): a name matches if any term occurs in it.
+    """
+
+    def __init__(self, terms=()):
+        self.terms = sorted(set(term for term in terms if term),
+                            key=len, reverse=True)
+        if self.terms:
+            self.pattern = re.compile('|'.join(map(re.escape, self.terms)))
+        else:
+            self.pattern = None
+
+    @classmethod
+    def from_system(cls, sys_config):
+        """Build the filter for the `[ignore]` section of system.ini.
+
+        Both `coin` and `market` entries are substring matches, so one
+        filter covers them.
+        """
+        return cls(sys_config.ignore_markets_by_in
+                   + sys_config.ignore_markets_by_find)
+
+    def __bool__(self):
+        return self.pattern is not None
+
+    def __repr__(self):
+        return "MarketFilter({!r})".format(self.terms)
+
+    def match(self, name):
+        """The term that makes `name` ignorable.
+
+        Returns:
+            str: the first matching term, or None.
+        """
+        if self.pattern is None:
+            return None
+        found = self.pattern.search(name)
+        return found.group(0) if found else None
+
+    def skip(self, name):
+        "True if `name` contains any of the terms."
+        return self.match(name) is not None
+
+    def mask(self, names):
+        """Classify many names with one scan of the compiled pattern.
+
+        Returns:
+            numpy.ndarray: boolean array, True where the name matches.
+        """
+        names = ['' if name is None else name for name in names]
+        result = numpy.zeros(len(names), dtype=bool)
+        if self.pattern is None or not names:
+            return result
+
+        starts = list()
+        offset = 0
+        for name in names:
+            starts.append(offset)
+            offset += len(name) + len(SEPARATOR)
+
+        text = SEPARATOR.join(names)
+        for found in self.pattern.finditer(text):
+            result[bisect.bisect_right(starts, found.start()) - 1] = True
+
+        return result
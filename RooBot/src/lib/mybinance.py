@@ -1,17 +1,78 @@
-#Reviewed by AJV 01-28-2018
-# core
-import configparser
-
-# 3rd party
-
-# local
-
-#Changed AJV 01/22/2018
-from binance.client import Client
-
-
-def make_binance(config):
-
-    b = Client(config.get('api', 'key'), config.get('api', 'secret'))
-
-    return b
\ No newline at end of file
+#Reviewed by AJV 01-28-2018
+"""Hand out one Binance client per account for the whole process.
+
+Building a `binance.client.Client` opens a new HTTP session and pings the
+server. `make_binance` is called by every task for every user, so clients
+are kept in a registry keyed by API key and reused, which keeps one
+keep-alive session per account. The client itself is only built on the
+first API call, so a task that never talks to Binance pays nothing.
+"""
+# core
+import configparser
+import threading
+
+# 3rd party
+
+# local
+from . import ratelimit
+
+#Changed AJV 01/22/2018
+from binance.client import Client
+
+CLIENTS = dict()
+"(API key, secret) -> RateLimitedClient"
+
+CLIENTS_LOCK = threading.Lock()
+
+
+class LazyClient:
+    """Build the Binance client on first use.
+
+    Attributes:
+        API_KEY -- available without building the client
+    """
+
+    def __init__(self, key, secret):
+        self.API_KEY = key
+        self._secret = secret
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        "The underlying `binance.client.Client`, built on first access."
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = Client(self.API_KEY, self._secret)
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def __repr__(self):
+        return "LazyClient({}..., built={})".format(
+            self.API_KEY[:6], self._client is not None)
+
+
+def make_binance(config):
+    """Return the Binance client of the account configured in `config`.
+
+    The same client is returned every time for the same API key. Its calls
+    respect the request weight limit shared through `ratelimit.BUCKET`.
+    """
+    key, secret = config.get('api', 'key'), config.get('api', 'secret')
+
+    with CLIENTS_LOCK:
+        b = CLIENTS.get((key, secret))
+        if b is None:
+            b = ratelimit.RateLimitedClient(LazyClient(key, secret))
+            CLIENTS[key, secret] = b
+
+    return b
+
+
+def forget_clients():
+    "Drop every cached client, e.g. after API keys have been rotated."
+    with CLIENTS_LOCK:
+        CLIENTS.clear()
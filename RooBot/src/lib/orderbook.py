@@ -0,0 +1,143 @@
+"""Simulate filling an order against an order book.
+
+`simulate` answers "what would it cost to buy (or sell) this much?" using
+cumulative sums over the book's levels: the volume-weighted average price,
+the worst price touched and the slippage from the best price.
+
+`fill_for` asks Binance for a light book first. When the notional is not
+covered, the levels it has show how deep the book must be, and the next
+request goes straight to that tier, falling back to the deepest one if the
+estimate was short. Small
+depths cost 1 request weight instead of 10 for `limit=1000`, and far fewer
+bytes. When `lib.depthcache` keeps a live book
+of the symbol, that book is used first and no request is made at all.
+"""
+
+# core
+import collections
+
+# 3rd party
+import numpy
+
+# local
+from . import depthcache
+
+DEPTH_TIERS = (5, 10, 20, 50, 100, 500, 1000)
+"The `limit` values Binance accepts for get_order_book, lightest first."
+
+FIRST_DEPTH = 20
+"The first book fetched. Up to 100 levels cost the same request weight."
+
+DEPTH_MARGIN = 2
+"Fetch this many times the levels the first book suggests are needed."
+
+Fill = collections.namedtuple(
+    'Fill', 'vwap worst_price quantity notional slippage depth')
+"""The outcome of filling `notional` (in the quote asset) against a book.
+
+vwap: average price paid per unit.
+worst_price: the price of the last level touched. A limit order at this
+    price fills completely against the book as it stands.
+quantity: units obtained.
+slippage: percent between the best price and the vwap.
+depth: the `limit` of the book used, or 'local' for a cached book.
+"""
+
+
+def simulate(levels, notional, depth=None):
+    """Fill `notional` against book levels, best price first.
+
+    Args:
+        levels (list): [price, quantity] pairs, as strings or numbers.
+        notional (float): the amount of the quote asset (e.g. BTC) to fill.
+        depth (int): recorded on the Fill.
+
+    Returns:
+        Fill: or None if the levels do not hold `notional`.
+    """
+    if not levels or notional <= 0:
+        return None
+
+    book = numpy.array(levels, dtype=float)[:, :2]
+    prices, quantities = book[:, 0], book[:, 1]
+    costs = numpy.cumsum(prices * quantities)
+    units = numpy.cumsum(quantities)
+
+    # The first level at which the cumulative cost exceeds the notional.
+    last = numpy.searchsorted(costs, notional, side='right')
+    if last >= len(prices):
+        return None
+
+    spent_before = costs[last - 1] if last else 0.0
+    units_before = units[last - 1] if last else 0.0
+    quantity = units_before + (notional - spent_before) / prices[last]
+
+    vwap = notional / quantity
+    best = prices[0]
+    return Fill(
+        vwap=float(vwap),
+        worst_price=float(prices[last]),
+        quantity=float(quantity),
+        notional=float(notional),
+        slippage=float(abs(vwap - best) / best * 100),
+        depth=depth,
+    )
+
+
+def deeper_tier(levels, notional, tiers=DEPTH_TIERS):
+    """The lightest tier likely to cover `notional`, judged from `levels`.
+
+    The levels already fetched tell how much a level holds on average;
+    the tier returned has DEPTH_MARGIN times the levels that average needs.
+    """
+    held = sum(float(price) * float(quantity)
+               for price, quantity in (level[:2] for level in levels))
+    if not held:
+        return tiers[-1]
+    needed = DEPTH_MARGIN * len(levels) * notional / held
+    for limit in tiers:
+        if limit >= needed:
+            return limit
+    return tiers[-1]
+
+
+def fill_for(exchange, symbol, notional, side='asks', tiers=DEPTH_TIERS,
+             first=FIRST_DEPTH):
+    """Simulate `notional` against the book, fetching at most three depths.
+
+    The `first` depth covers most orders. When it does not, its levels
+    give the size of the book's levels, and the second request goes
+    straight to the tier that size calls for. Should the deeper levels be
+    thinner than that, a last request reads the deepest tier.
+
+    Args:
+        side (str): 'asks' to buy, 'bids' to sell.
+
+    Returns:
+        Fill: or None if the book is too thin.
+    """
+    local = depthcache.order_book(symbol)
+    if local is not None:
+        fill = simulate(local[side], notional, depth='local')
+        if fill:
+            return fill
+
+    book = exchange.get_order_book(symbol=symbol, limit=first)
+    levels = book[side]
+    fill = simulate(levels, notional, depth=first)
+    if fill or len(levels) < first:
+        # Covered, or the book has no more levels to give.
+        return fill
+
+    limit = deeper_tier(levels, notional, tiers)
+    if limit <= first:
+        return None
+    book = exchange.get_order_book(symbol=symbol, limit=limit)
+    levels = book[side]
+    fill = simulate(levels, notional, depth=limit)
+    if fill or len(levels) < limit or limit >= tiers[-1]:
+        return fill
+
+    # The levels past the first ones were thinner than the estimate.
+    book = exchange.get_order_book(symbol=symbol, limit=tiers[-1])
+    return simulate(book[side], notional, depth=tiers[-1])
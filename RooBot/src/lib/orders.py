@@ -0,0 +1,219 @@
+"""A local ledger of Binance orders.
+
+The profit report needs the buy and the sell order of every trade. Asking
+for them one `get_order` at a time costs two requests per trade. `lookup`
+instead groups the orders by symbol and reads each symbol's history with
+`get_all_orders`, starting at the oldest order id it needs. Binance caps a
+`startTime` query at 24 hours, while order (and trade) ids cover the whole
+history.
+
+Everything fetched is stored in the `orders` table with the fields reports
+use: status, price, quantities, commission and close time. An order in a
+terminal status never changes again, so it is answered from SQLite forever.
+Only orders that are still open (or not seen yet) are fetched, and a report
+whose trades are all closed runs without touching the API.
+"""
+
+# core
+import collections
+import datetime
+import json
+import logging
+
+# local
+from .db import db
+
+LOGGER = logging.getLogger(__name__)
+
+TERMINAL = frozenset(['FILLED', 'CANCELED', 'REJECTED', 'EXPIRED'])
+"Statuses after which an order never changes."
+
+ALL_ORDERS_LIMIT = 1000
+"Most orders (or trades) Binance returns from one call."
+
+
+def from_millis(millis):
+    "Binance milliseconds as a datetime."
+    return datetime.datetime.fromtimestamp(millis / 1000.0)
+
+
+def ledger(symbol, order_ids):
+    """The orders of `symbol` already in the ledger.
+
+    Returns:
+        dict: order id (as a string) -> `orders` row
+    """
+    rows = db(
+        (db.orders.symbol == symbol) & (db.orders.order_id.belongs(order_ids))
+    ).select()
+    return {row.order_id: row for row in rows}
+
+
+def fields_of(order, commissions=None):
+    """The ledger columns of an order returned by the API.
+
+    Args:
+        commissions (dict): order id -> {asset: commission}, from
+            `commissions`.
+    """
+    order_id = str(order['orderId'])
+    paid = (commissions or {}).get(order_id, {})
+    commission, commission_asset = 0.0, None
+    if len(paid) == 1:
+        (commission_asset, commission), = paid.items()
+    elif paid:
+        # Paid in several assets; only `commissions` can say how much.
+        commission = None
+    closed_at = None
+    if order['status'] in TERMINAL:
+        closed_at = from_millis(order.get('updateTime', order['time']))
+
+    return dict(
+        symbol=order['symbol'],
+        order_id=order_id,
+        side=order.get('side'),
+        status=order['status'],
+        price=float(order['price']),
+        orig_qty=float(order['origQty']),
+        executed_qty=float(order['executedQty']),
+        quote_qty=float(order.get('cummulativeQuoteQty') or 0),
+        commission=commission,
+        commission_asset=commission_asset,
+        commissions=json.dumps(paid),
+        placed_at=from_millis(order['time']),
+        closed_at=closed_at,
+        payload=json.dumps(order),
+        fetched_at=datetime.datetime.now(),
+    )
+
+
+def save(orders, commissions=None):
+    "Insert or update `orders` in the ledger."
+    for order in orders:
+        fields = fields_of(order, commissions)
+        db.orders.update_or_insert(
+            (db.orders.symbol == fields['symbol']) &
+            (db.orders.order_id == fields['order_id']),
+            **fields)
+    db.commit()
+
+
+def paged(fetch, key, param, start):
+    """Page through an endpoint that returns at most ALL_ORDERS_LIMIT rows.
+
+    Pages are only fetched as the caller iterates, so a caller that stops
+    early saves the remaining requests.
+
+    Args:
+        key (str): the id field of a returned row.
+        param (str): the request parameter that starts a page at an id.
+        start (int): the id of the first row wanted.
+    """
+    while True:
+        page = fetch(**{param: start, 'limit': ALL_ORDERS_LIMIT})
+        for item in page:
+            yield item
+        if len(page) < ALL_ORDERS_LIMIT:
+            return
+        start = max(item[key] for item in page) + 1
+
+
+def fetch_history(exchange, symbol, order_id):
+    """Every order of `symbol` from `order_id` on.
+
+    Yields:
+        dict: orders as returned by get_all_orders.
+    """
+    def fetch(**kwargs):
+        return exchange.get_all_orders(symbol=symbol, **kwargs)
+    return paged(fetch, 'orderId', 'orderId', int(order_id))
+
+
+def commissions(exchange, symbol, order_id):
+    """The commission paid on each order of `symbol` from `order_id` on.
+
+    Orders do not carry their commission; the trades that filled them do.
+    The trades of one order may pay in different assets (e.g. BNB until it
+    runs out, then the quote asset), so each asset is summed separately.
+
+    Args:
+        order_id: an order that executed. Its first trade is where the
+            trade history is read from.
+
+    Returns:
+        dict: order id (as a string) -> {commission asset: commission}
+    """
+    def fetch(**kwargs):
+        return exchange.get_my_trades(symbol=symbol, **kwargs)
+
+    first = fetch(orderId=int(order_id))
+    if not first:
+        return dict()
+
+    paid = collections.defaultdict(lambda: collections.defaultdict(float))
+    start = min(trade['id'] for trade in first)
+    for trade in paged(fetch, 'id', 'fromId', start):
+        order_id = str(trade['orderId'])
+        paid[order_id][trade['commissionAsset']] += float(trade['commission'])
+    return {order_id: dict(assets) for order_id, assets in paid.items()}
+
+
+def commission_text(row):
+    "The commission of an `orders` row for a report, e.g. '0.00120000 BNB'."
+    paid = json.loads(row.commissions) if row.commissions else None
+    if not paid and row.commission_asset:
+        paid = {row.commission_asset: row.commission}
+    if not paid:
+        return str(row.commission or 0.0)
+    return ', '.join(
+        '{:.8f} {}'.format(amount, asset) for asset, amount in sorted(paid.items()))
+
+
+def lookup(exchange, wanted):
+    """Find orders in the ledger, fetching at most one history per symbol.
+
+    Args:
+        wanted (dict): symbol -> set of order ids.
+
+    Returns:
+        dict: (symbol, order id as a string) -> `orders` row. Orders the
+        exchange did not return are missing.
+    """
+    found = dict()
+    for symbol, order_ids in wanted.items():
+        order_ids = [str(order_id) for order_id in order_ids]
+        rows = ledger(symbol, order_ids)
+        stale = [
+            order_id for order_id in order_ids
+            if order_id not in rows or rows[order_id].status not in TERMINAL
+        ]
+
+        if stale:
+            start = min(int(order_id) for order_id in stale)
+            print("Fetching {} order history from order {} for {} orders".format(
+                symbol, start, len(stale)))
+            history = list(fetch_history(exchange, symbol, start))
+            executed = [
+                order['orderId'] for order in history
+                if float(order['executedQty'])
+            ]
+            paid = None
+            if executed:
+                paid = commissions(exchange, symbol, min(executed))
+            save(history, paid)
+            rows = ledger(symbol, order_ids)
+
+        for order_id, row in rows.items():
+            found[(symbol, order_id)] = row
+
+    return found
+
+
+def wanted_by_symbol(buy_rows):
+    "The buy and sell order of every row, grouped for `lookup`."
+    wanted = collections.defaultdict(set)
+    for row in buy_rows:
+        for order_id in (row.order_id, row.sell_id):
+            if order_id:
+                wanted[row.market].add(str(order_id))
+    return wanted
@@ -0,0 +1,218 @@
+"""Keep every Binance client in this process under the request weight limit.
+
+Binance gives each IP address a budget of request weight per minute and
+bans IPs (HTTP 418) that keep going after being told to slow down (HTTP
+429). All users of RooBot share one IP, so all clients share one
+`TokenBucket`.
+
+`RateLimitedClient` wraps a `binance.client.Client`. Before each API call
+it takes the endpoint's weight from the bucket, blocking until enough has
+refilled. After each call it reads the `X-MBX-USED-WEIGHT` header and
+drains the bucket to match what Binance has counted. A 429 or 418 pauses
+every client for the `Retry-After` period before the error is re-raised
+to the caller's own retry policy.
+"""
+
+# core
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+WEIGHT_LIMIT = 1200
+"Request weight Binance allows per IP per minute."
+
+SAFETY_MARGIN = 0.9
+"Only plan to use this fraction of WEIGHT_LIMIT."
+
+BAN_STATUS_CODES = (418, 429)
+
+DEFAULT_BACKOFF = 60
+"Seconds to pause on a 429/418 without a Retry-After header."
+
+
+def _order_book_weight(kwargs):
+    limit = int(kwargs.get('limit', 100))
+    if limit <= 100:
+        return 1
+    if limit <= 500:
+        return 5
+    return 10
+
+
+def _all_or_one(all_weight, one_weight=1):
+    "Endpoints that cost more when called without a symbol."
+    def weight(kwargs):
+        return one_weight if kwargs.get('symbol') else all_weight
+    return weight
+
+
+ENDPOINT_WEIGHTS = {
+    # Market data
+    'get_order_book': _order_book_weight,
+    'get_ticker': _all_or_one(40),
+    'get_orderbook_tickers': _all_or_one(2),
+    'get_symbol_ticker': _all_or_one(2),
+    'get_exchange_info': 1,
+    # Account
+    'get_account': 10,
+    'get_asset_balance': 10,
+    'get_order': 2,
+    'get_open_orders': _all_or_one(40, 3),
+    'get_all_orders': 10,
+    'get_my_trades': 10,
+    # Orders
+    'order_limit_buy': 1,
+    'order_limit_sell': 1,
+    'cancel_order': 1,
+    # User data stream
+    'stream_get_listen_key': 1,
+    'stream_keepalive': 1,
+}
+"""Client method -> weight, or a function of the call's keyword arguments.
+
+Every endpoint RooBot calls is listed. DEFAULT_WEIGHT only covers calls
+added without updating this table."""
+
+DEFAULT_WEIGHT = 1
+
+
+def weight_for(method, kwargs):
+    "The request weight of calling `method` with `kwargs`."
+    weight = ENDPOINT_WEIGHTS.get(method, DEFAULT_WEIGHT)
+    if callable(weight):
+        return weight(kwargs)
+    return weight
+
+
+class TokenBucket:
+    """A thread-safe token bucket.
+
+    Args:
+        capacity (float): most tokens the bucket holds.
+        rate (float): tokens added per second.
+    """
+
+    def __init__(self, capacity, rate, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = rate
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def wait_time(self, weight):
+        "Seconds until `weight` tokens could be taken. Caller holds the lock."
+        now = self.clock()
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        # A call heavier than the whole bucket waits for a full bucket.
+        needed = min(weight, self.capacity)
+        if self.tokens >= needed:
+            return 0
+        return (needed - self.tokens) / self.rate
+
+    def acquire(self, weight, sleep=time.sleep):
+        """Take `weight` tokens, sleeping until they are available.
+
+        Returns:
+            float: total seconds spent waiting.
+        """
+        waited = 0
+        while True:
+            with self.lock:
+                delay = self.wait_time(weight)
+                if not delay:
+                    self.tokens -= weight
+                    return waited
+            sleep(delay)
+            waited += delay
+
+    def observe(self, used):
+        """Align the bucket with the weight Binance says this IP has used."""
+        with self.lock:
+            self._refill(self.clock())
+            self.tokens = min(self.tokens, self.capacity - used)
+
+    def pause(self, seconds):
+        "Stop handing out tokens for `seconds`."
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            self.tokens = 0
+
+
+BUCKET = TokenBucket(WEIGHT_LIMIT * SAFETY_MARGIN, WEIGHT_LIMIT / 60.0)
+"Shared by every RateLimitedClient in the process."
+
+
+def used_weight(response):
+    "The X-MBX-USED-WEIGHT header of a requests response, or None."
+    if response is None:
+        return None
+    headers = getattr(response, 'headers', None) or {}
+    headers = {key.lower(): value for key, value in headers.items()}
+    for header in ('x-mbx-used-weight-1m', 'x-mbx-used-weight'):
+        value = headers.get(header)
+        if value is not None:
+            return int(value)
+    return None
+
+
+def retry_after(exc):
+    "Seconds the server asked us to back off for, from a Binance error."
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return int(headers.get('Retry-After', DEFAULT_BACKOFF))
+    except (TypeError, ValueError):
+        return DEFAULT_BACKOFF
+
+
+class RateLimitedClient:
+    """Wrap a Binance client so that every API call goes through a bucket.
+
+    Attributes that are not methods pass straight through to the client.
+    """
+
+    def __init__(self, client, bucket=BUCKET):
+        self._client = client
+        self._bucket = bucket
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute) or name.startswith('_'):
+            return attribute
+
+        def call(*args, **kwargs):
+            waited = self._bucket.acquire(weight_for(name, kwargs))
+            if waited:
+                LOGGER.info("Waited %.2fs for request weight for %s",
+                            waited, name)
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as exc:
+                if getattr(exc, 'status_code', None) in BAN_STATUS_CODES:
+                    seconds = retry_after(exc)
+                    print("Binance rate limit hit on {}. Pausing {}s".format(
+                        name, seconds))
+                    self._bucket.pause(seconds)
+                raise
+
+            used = used_weight(getattr(self._client, 'response', None))
+            if used is not None:
+                self._bucket.observe(used)
+            return result
+
+        call.__name__ = name
+        return call
+
+    def __repr__(self):
+        return "RateLimitedClient({!r})".format(self._client)
@@ -1 +1 @@
-#Reviewed by AJV 01/23/2018
+#Reviewed by AJV 01/23/2018
@@ -0,0 +1,85 @@
+"""Score and rank surging markets with array operations.
+
+`analyze_gain` used to walk every market in a Python loop. Here every input
+is a NumPy array aligned on the same symbol index, so the gain, the filters
+and the ranking are a handful of vectorized operations no matter how many
+markets (or quote assets) are scanned.
+"""
+
+# 3rd party
+import numpy
+
+MARKET_URL = 'https://bittrex.com/Market/Index?MarketName={0}'
+"Link included in every ranked 5-tuple."
+
+
+def percent_gains(current, previous):
+    """The percentage increase from previous to current, element-wise.
+
+    Returns:
+        numpy.ndarray: NaN or inf where `previous` is missing or zero.
+    """
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return (current - previous) / previous * 100
+
+
+def eligible(current, previous, volumes, open_orders, skip,
+             min_volume, min_price, max_orders):
+    """Decide which markets take part in the surge ranking.
+
+    A market is eligible when it has both prices, is not on an ignore list,
+    traded at least `min_volume` in 24 hours, has fewer than `max_orders`
+    open orders and costs at least `min_price`. Missing volumes are NaN and
+    therefore never eligible.
+
+    `min_volume` may be a scalar or an array aligned on the markets, so a
+    separate threshold can be used per quote asset.
+
+    Returns:
+        numpy.ndarray: boolean mask aligned on the markets.
+    """
+    with numpy.errstate(invalid='ignore'):
+        return (
+            numpy.isfinite(current) & numpy.isfinite(previous)
+            & (previous > 0)
+            & ~skip
+            & (volumes >= min_volume)
+            & (open_orders < max_orders)
+            & (current >= min_price)
+        )
+
+
+def rank(names, current, previous, volumes, open_orders, skip,
+         min_volume, min_price, max_orders):
+    """Rank eligible markets by percent gain, best first.
+
+    Args:
+        names (list): market names; index `i` names slot `i` of every array.
+        current (numpy.ndarray): the latest ask prices.
+        previous (numpy.ndarray): the ask prices one sample period ago.
+        volumes (numpy.ndarray): 24 hour volumes.
+        open_orders (numpy.ndarray): open sell orders per market.
+        skip (numpy.ndarray): True for markets on an ignore list.
+
+    Returns:
+        list : 5-tuples of (name, percent gain, previous ask, current ask,
+        url), the same shape `analyze_gain` has always returned.
+    """
+    mask = eligible(current, previous, volumes, open_orders, skip,
+                    min_volume, min_price, max_orders)
+    gains = percent_gains(current, previous)
+
+    index = numpy.flatnonzero(mask)
+    # A stable sort keeps ties in symbol order, like sorted() did.
+    index = index[numpy.argsort(-gains[index], kind='stable')]
+
+    return [
+        (
+            names[i],
+            float(gains[i]),
+            float(previous[i]),
+            float(current[i]),
+            MARKET_URL.format(names[i]),
+        )
+        for i in index
+    ]
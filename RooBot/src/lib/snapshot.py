@@ -0,0 +1,209 @@
+"""Store market data as one snapshot row plus packed per-symbol vectors.
+
+The `market` table repeats the market name and a timestamp for every coin
+on every download. A snapshot instead records the download once and packs
+the ask prices and 24-hour volumes of every market into BLOBs of float64.
+
+Position `i` of every vector belongs to the symbol whose `symbol.id` is
+`i + 1`. Symbols are interned the first time a download sees them and are
+never renumbered, so vectors written earlier are simply shorter and get
+padded with NaN when loaded.
+
+Example:
+
+        names, current, previous = snapshot.latest_pair()
+        gains = (current - previous) / previous * 100
+"""
+
+# core
+from datetime import datetime
+
+# 3rd party
+import numpy
+
+# local
+from .db import db
+
+SOURCE = 'binance'
+"Where the snapshot prices came from."
+
+DTYPE = numpy.dtype('<f8')
+"Little-endian float64, so the BLOBs do not depend on the host."
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+LATEST = dict()
+"""count -> (newest snapshot and symbol ids, result of `latest`).
+
+Lets a long-running process such as `invoke daemon` keep the latest
+snapshots in memory until a new download is recorded."""
+
+
+def symbol_ids():
+    """Map every interned market name to its symbol id.
+
+    Returns:
+        dict: market name -> symbol id
+    """
+    rows = db.executesql('SELECT name, id FROM symbol;')
+    return dict(rows)
+
+
+def symbol_names():
+    """List the interned market names in vector order.
+
+    Returns:
+        list: market names, where index `i` is the name of vector slot `i`.
+    """
+    names = list()
+    for name, symbol_id in db.executesql('SELECT name, id FROM symbol ORDER BY id;'):
+        # Ids are dense, but pad defensively if a row was ever deleted.
+        names.extend([None] * (symbol_id - 1 - len(names)))
+        names.append(name)
+    return names
+
+
+def intern_symbols(names):
+    """Give every market name a stable symbol id.
+
+    Returns:
+        dict: market name -> symbol id, covering every interned symbol.
+    """
+    known = symbol_ids()
+    for name in names:
+        if name not in known:
+            known[name] = int(db.symbol.insert(name=name))
+    return known
+
+
+def pack(values, ids):
+    """Pack a name -> float mapping into a vector aligned on symbol id.
+
+    Markets without a value are stored as NaN.
+
+    Returns:
+        bytes: the float64 vector.
+    """
+    vector = numpy.full(max(ids.values(), default=0), numpy.nan, dtype=DTYPE)
+    for name, value in values.items():
+        vector[ids[name] - 1] = float(value)
+    return vector.tobytes()
+
+
+def unpack(blob, size):
+    """Turn a stored BLOB back into a vector of `size` slots.
+
+    Returns:
+        numpy.ndarray: float64 vector, NaN-padded to `size`.
+    """
+    return pad(numpy.frombuffer(blob or b'', dtype=DTYPE), size)
+
+
+def pad(vector, size):
+    """NaN-pad a vector written before newer symbols were interned.
+
+    Returns:
+        numpy.ndarray: float64 vector of at least `size` slots.
+    """
+    vector = numpy.asarray(vector, dtype=DTYPE)
+    if len(vector) < size:
+        vector = numpy.concatenate(
+            (vector, numpy.full(size - len(vector), numpy.nan, dtype=DTYPE)))
+    return vector
+
+
+def record(asks, volumes=None, source=SOURCE, taken_at=None):
+    """Store one snapshot of the market.
+
+    Args:
+        asks (dict): market name -> ask price.
+        volumes (dict): market name -> 24 hour volume in the quote asset.
+        source (str): where the prices came from.
+        taken_at (datetime): when the prices were sampled. Defaults to now.
+
+    Returns:
+        int: the id of the new snapshot row.
+    """
+    volumes = volumes or dict()
+    taken_at = taken_at or datetime.now()
+
+    ids = intern_symbols(list(asks) + list(volumes))
+
+    # pyDAL base64-encodes blob fields, so bind the raw bytes ourselves.
+    db.executesql(
+        'INSERT INTO snapshot (taken_at, source, asks, volumes) '
+        'VALUES (?, ?, ?, ?);',
+        placeholders=(taken_at.strftime(TIMESTAMP_FORMAT), source,
+                      pack(asks, ids), pack(volumes, ids))
+    )
+    snapshot_id = db.executesql('SELECT last_insert_rowid();')[0][0]
+    db.commit()
+    return snapshot_id
+
+
+def latest(count=2):
+    """Load the most recent snapshots.
+
+    Returns:
+        tuple: (names, [(taken_at, asks, volumes), ...]) newest first, with
+        every vector aligned on `names`.
+    """
+    state = db.executesql(
+        'SELECT (SELECT MAX(id) FROM snapshot), (SELECT MAX(id) FROM symbol);'
+    )[0]
+    cached = LATEST.get(count)
+    if cached and cached[0] == state:
+        return cached[1]
+
+    rows = db.executesql(
+        'SELECT taken_at, asks, volumes FROM snapshot '
+        'ORDER BY taken_at DESC, id DESC LIMIT ?;',
+        placeholders=(count,)
+    )
+    names = symbol_names()
+    size = len(names)
+    result = names, [
+        (taken_at, unpack(asks, size), unpack(volumes, size))
+        for taken_at, asks, volumes in rows
+    ]
+    LATEST[count] = (tuple(state), result)
+    return result
+
+
+def latest_pair():
+    """Load the ask vectors of the 2 most recent snapshots.
+
+    Returns:
+        tuple: (names, current asks, previous asks) or None if fewer than 2
+        snapshots have been recorded.
+    """
+    names, snapshots = latest(2)
+    if len(snapshots) != 2:
+        return None
+
+    (_, current, _), (_, previous, _) = snapshots
+    return names, current, previous
+
+
+def history(start=None):
+    """Lazily load snapshots in the order they were taken.
+
+    Args:
+        start (datetime): skip snapshots taken before this.
+
+    Yields:
+        tuple: (taken_at, asks, volumes) with vectors aligned on
+        `symbol_names()` as of the call.
+    """
+    start = (start or datetime.min).strftime(TIMESTAMP_FORMAT)
+    size = len(symbol_names())
+    rows = db.executesql(
+        'SELECT id FROM snapshot WHERE taken_at >= ? ORDER BY taken_at, id;',
+        placeholders=(start,)
+    )
+    for (snapshot_id,) in rows:
+        taken_at, asks, volumes = db.executesql(
+            'SELECT taken_at, asks, volumes FROM snapshot WHERE id = ?;',
+            placeholders=(snapshot_id,)
+        )[0]
+        yield taken_at, unpack(asks, size), unpack(volumes, size)
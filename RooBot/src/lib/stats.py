@@ -0,0 +1,315 @@
+"""Maintain rolling per-market statistics across snapshots.
+
+`analyze_gain` only knows the gain since the previous download. This module
+keeps, for every market, the return over several horizons (1 hour, 1 day and
+1 week by default), the highest and lowest ask within each horizon and an
+exponential moving average of the 24 hour volume. `update` folds in one new
+snapshot at a time:
+
+* The returns compare the new asks with the ring-buffer row at the start of
+  each horizon, which is a single vector division.
+* A high or low only moves to the new ask. It is only recomputed, and only
+  for the affected markets, when the row that held it leaves the horizon.
+* The volume EMA is a single multiply-add.
+
+The state is a ring buffer of the last CAPACITY ask vectors, aligned on
+`symbol.id` like the snapshots. It is saved as one compressed BLOB in the
+`market_stats` table, so `invoke buy` can read it without scanning history.
+
+Example:
+
+        market_stats = stats.load()
+        day = market_stats.aligned(market_stats.returns(stats.DAY), names)
+"""
+
+# core
+from datetime import datetime, timedelta
+import io
+import warnings
+
+# 3rd party
+import numpy
+
+# local
+from .db import db
+from . import snapshot
+
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+HORIZONS = (HOUR, DAY, WEEK)
+"Seconds over which returns, highs and lows are tracked."
+
+CAPACITY = 7 * 24 + 2
+"""Ask vectors kept in the ring buffer. Enough for a week of hourly
+downloads; with more frequent downloads the longest horizons report NaN."""
+
+VOLUME_EMA_SPAN = 24
+"Snapshots in the span of the volume EMA."
+
+
+def _nanextreme(reduce, values):
+    "Reduce over rows, returning NaN for all-NaN columns without warning."
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return reduce(values, axis=0)
+
+
+class MarketStats:
+    """Rolling statistics of every market, updated one snapshot at a time.
+
+    Args:
+        horizons (iterable): seconds over which to track returns and extremes.
+        capacity (int): ask vectors kept in the ring buffer.
+        span (int): snapshots in the span of the volume EMA.
+    """
+
+    def __init__(self, horizons=HORIZONS, capacity=CAPACITY,
+                 span=VOLUME_EMA_SPAN):
+        self.horizons = tuple(sorted(horizons))
+        self.capacity = capacity
+        self.span = span
+        self.times = numpy.full(capacity, numpy.nan)
+        self.prices = numpy.full((capacity, 0), numpy.nan)
+        self.head = 0
+        "Ring row the next snapshot is written to."
+        self.count = 0
+        self.highs = {h: numpy.full(0, numpy.nan) for h in self.horizons}
+        self.lows = {h: numpy.full(0, numpy.nan) for h in self.horizons}
+        self.volume_ema = numpy.full(0, numpy.nan)
+
+    @property
+    def size(self):
+        "Number of markets tracked."
+        return self.prices.shape[1]
+
+    @property
+    def last_time(self):
+        "Epoch seconds of the latest snapshot, or None."
+        if not self.count:
+            return None
+        return self.times[(self.head - 1) % self.capacity]
+
+    def _grow(self, size):
+        "Make room for markets interned since the last update."
+        extra = size - self.size
+        if extra <= 0:
+            return
+
+        def pad(vector):
+            return numpy.concatenate((vector, numpy.full(extra, numpy.nan)))
+
+        self.prices = numpy.hstack(
+            (self.prices, numpy.full((self.capacity, extra), numpy.nan)))
+        self.highs = {h: pad(v) for h, v in self.highs.items()}
+        self.lows = {h: pad(v) for h, v in self.lows.items()}
+        self.volume_ema = pad(self.volume_ema)
+
+    def _rows(self):
+        "Ring rows in chronological order."
+        start = self.head - self.count
+        return numpy.arange(start, self.head) % self.capacity
+
+    def _rows_after(self, when):
+        "Ring rows newer than `when`, in chronological order."
+        rows = self._rows()
+        return rows[self.times[rows] > when]
+
+    def _reference_row(self, when):
+        "The newest row taken at or before `when`, or None."
+        rows = self._rows()
+        rows = rows[self.times[rows] <= when]
+        return rows[-1] if len(rows) else None
+
+    def update(self, taken_at, asks, volumes):
+        """Fold one snapshot into the statistics.
+
+        Args:
+            taken_at (datetime): when the snapshot was taken.
+            asks (numpy.ndarray): ask prices aligned on symbol id.
+            volumes (numpy.ndarray): 24 hour volumes aligned on symbol id.
+
+        Returns:
+            bool: False if the snapshot is not newer than the last one.
+        """
+        when = taken_at.timestamp()
+        last = self.last_time
+        if last is not None and when <= last:
+            return False
+
+        self._grow(max(len(asks), len(volumes)))
+        asks = snapshot.pad(asks, self.size)
+        volumes = snapshot.pad(volumes, self.size)
+
+        # Rows leaving each horizon, including the one about to be overwritten.
+        rows = self._rows()
+        overwritten = self.head if self.count == self.capacity else None
+        stale = dict()
+        for horizon in self.horizons:
+            leaving = rows[(self.times[rows] > (last or when) - horizon)
+                           & (self.times[rows] <= when - horizon)]
+            if overwritten is not None and overwritten not in leaving:
+                leaving = numpy.append(leaving, overwritten)
+            leaving_prices = self.prices[leaving]
+            stale[horizon] = numpy.flatnonzero(
+                (leaving_prices == self.highs[horizon]).any(axis=0)
+                | (leaving_prices == self.lows[horizon]).any(axis=0))
+
+        self.times[self.head] = when
+        self.prices[self.head] = asks
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+        for horizon in self.horizons:
+            self.highs[horizon] = numpy.fmax(self.highs[horizon], asks)
+            self.lows[horizon] = numpy.fmin(self.lows[horizon], asks)
+            columns = stale[horizon]
+            if len(columns):
+                window = self.prices[self._rows_after(when - horizon)][:, columns]
+                self.highs[horizon][columns] = _nanextreme(numpy.nanmax, window)
+                self.lows[horizon][columns] = _nanextreme(numpy.nanmin, window)
+
+        alpha = 2.0 / (self.span + 1)
+        blended = alpha * volumes + (1 - alpha) * self.volume_ema
+        # Start from the first volume seen; keep the average when a
+        # snapshot has no volume for a market.
+        self.volume_ema = numpy.where(
+            numpy.isnan(self.volume_ema), volumes,
+            numpy.where(numpy.isnan(volumes), self.volume_ema, blended))
+
+        return True
+
+    def current(self):
+        "The latest ask of every market."
+        if not self.count:
+            return numpy.full(self.size, numpy.nan)
+        return self.prices[(self.head - 1) % self.capacity]
+
+    def returns(self, horizon):
+        """Percent change of every ask over `horizon` seconds.
+
+        Returns:
+            numpy.ndarray: NaN where the history does not reach back that far.
+        """
+        if not self.count:
+            return numpy.full(self.size, numpy.nan)
+        row = self._reference_row(self.last_time - horizon)
+        if row is None:
+            return numpy.full(self.size, numpy.nan)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return (self.current() - self.prices[row]) / self.prices[row] * 100
+
+    def high(self, horizon):
+        "Highest ask of every market within `horizon` seconds."
+        return self.highs[horizon]
+
+    def low(self, horizon):
+        "Lowest ask of every market within `horizon` seconds."
+        return self.lows[horizon]
+
+    def aligned(self, values, names):
+        """Reorder a per-symbol vector to follow `names`.
+
+        Returns:
+            numpy.ndarray: NaN for names that are not interned.
+        """
+        ids = snapshot.symbol_ids()
+        result = numpy.full(len(names), numpy.nan)
+        for i, name in enumerate(names):
+            slot = ids.get(name, 0) - 1
+            if 0 <= slot < len(values):
+                result[i] = values[slot]
+        return result
+
+    def dumps(self):
+        "Serialize the statistics to bytes."
+        arrays = dict(
+            horizons=numpy.array(self.horizons),
+            settings=numpy.array([self.capacity, self.span, self.head,
+                                  self.count]),
+            times=self.times, prices=self.prices,
+            volume_ema=self.volume_ema)
+        for horizon in self.horizons:
+            arrays['high_{}'.format(horizon)] = self.highs[horizon]
+            arrays['low_{}'.format(horizon)] = self.lows[horizon]
+        buffer = io.BytesIO()
+        numpy.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def loads(cls, blob):
+        "Rebuild statistics serialized with `dumps`."
+        arrays = numpy.load(io.BytesIO(blob))
+        capacity, span, head, count = (int(x) for x in arrays['settings'])
+        stats = cls([int(h) for h in arrays['horizons']], capacity, span)
+        stats.head, stats.count = head, count
+        stats.times = arrays['times']
+        stats.prices = arrays['prices']
+        stats.volume_ema = arrays['volume_ema']
+        stats.highs = {h: arrays['high_{}'.format(h)] for h in stats.horizons}
+        stats.lows = {h: arrays['low_{}'.format(h)] for h in stats.horizons}
+        return stats
+
+
+def save(market_stats):
+    "Persist the statistics in the `market_stats` table."
+    db.executesql(
+        'INSERT OR REPLACE INTO market_stats (id, updated_at, state) '
+        'VALUES (1, ?, ?);',
+        placeholders=(datetime.now().strftime(snapshot.TIMESTAMP_FORMAT),
+                      market_stats.dumps())
+    )
+    db.commit()
+
+
+def rebuild(horizons=HORIZONS, capacity=CAPACITY, span=VOLUME_EMA_SPAN):
+    """Compute the statistics from the stored snapshots.
+
+    Only the snapshots within the longest horizon are replayed.
+
+    Returns:
+        MarketStats
+    """
+    market_stats = MarketStats(horizons, capacity, span)
+    start = datetime.now() - timedelta(seconds=max(horizons))
+    for taken_at, asks, volumes in snapshot.history(start):
+        market_stats.update(taken_at, asks, volumes)
+    return market_stats
+
+
+def load(horizons=HORIZONS, capacity=CAPACITY, span=VOLUME_EMA_SPAN):
+    """Load the persisted statistics.
+
+    Falls back to `rebuild` when nothing is stored yet or the stored state
+    was made with other settings.
+
+    Returns:
+        MarketStats
+    """
+    rows = db.executesql('SELECT state FROM market_stats WHERE id = 1;')
+    if rows and rows[0][0]:
+        market_stats = MarketStats.loads(rows[0][0])
+        if (market_stats.horizons == tuple(sorted(horizons))
+                and market_stats.capacity == capacity
+                and market_stats.span == span):
+            return market_stats
+
+    return rebuild(horizons, capacity, span)
+
+
+def update_from_latest():
+    """Fold the newest snapshot into the persisted statistics.
+
+    Called by `invoke download` after each snapshot is recorded.
+
+    Returns:
+        MarketStats
+    """
+    market_stats = load()
+    _, snapshots = snapshot.latest(1)
+    if snapshots:
+        taken_at, asks, volumes = snapshots[0]
+        market_stats.update(taken_at, asks, volumes)
+    save(market_stats)
+    return market_stats
@@ -0,0 +1,461 @@
+"""Detect surges in real time from Binance's all-market ticker stream.
+
+`invoke buy` compares two hourly snapshots, so a surge is only noticed at
+the top of the hour. `invoke stream` instead listens to the `!ticker@arr`
+WebSocket stream, which pushes the ticker of every market that changed
+about once a second, and feeds every update into `RollingGains`.
+
+`RollingGains` keeps one ring buffer of (time, ask) samples per market,
+long enough for the largest window (5m/15m/1h by default), and at most one
+sample every RESOLUTION seconds. Each update appends a sample, moves the
+start of every window forward and drops what fell out of the largest, so
+the reference price of every window is found without a search.
+
+Every few seconds `watch` turns the buffers into the same arrays `invoke buy`
+uses and, when a market clears min_gain, hands them to a thread that runs
+`lib.buy.main`, so placing orders never holds up the stream. It can
+also keep `lib.depthcache` following the order books of the top-ranked
+markets, so the buys they trigger are priced without a REST round trip.
+
+`ReplayServer` is a small local WebSocket server that plays back recorded
+frames, or the history in `lib.archive`, so the stream can be exercised
+without Binance:
+
+        server = ReplayServer(archive_frames()).start()
+        listen(server.url, tracker.update_from_message)
+"""
+
+# core
+import base64
+import collections
+import hashlib
+import json
+import logging
+import queue
+import socketserver
+import struct
+import threading
+import time
+
+# 3rd party
+import numpy
+import websocket
+
+# local
+from . import archive
+
+LOGGER = logging.getLogger(__name__)
+
+STREAM_URL = 'wss://stream.binance.com:9443/ws/!ticker@arr'
+"Tickers of every market that changed in the last second."
+
+WINDOWS = (300, 900, 3600)
+"Seconds over which gains are tracked by default."
+
+RESOLUTION = 5
+"Seconds between the samples RollingGains stores for one market."
+
+RECONNECT_DELAY = 5
+"Seconds to wait before reconnecting a dropped stream."
+
+
+def parse_tickers(message):
+    """Extract (symbol, event time, ask, 24h quote volume) from a frame.
+
+    Both `!ticker@arr` (which has the best ask `a`) and `!miniTicker@arr`
+    (only the close `c`) frames are understood.
+
+    Returns:
+        list: one tuple per ticker in the frame.
+    """
+    payload = json.loads(message) if isinstance(message, (str, bytes)) else message
+    if isinstance(payload, dict):
+        payload = payload.get('data', [payload])
+
+    tickers = list()
+    for ticker in payload:
+        price = ticker.get('a', ticker.get('c'))
+        if price is None:
+            continue
+        tickers.append((
+            ticker['s'],
+            ticker['E'] / 1000.0,
+            float(price),
+            float(ticker.get('q', 'nan')),
+        ))
+    return tickers
+
+
+class RollingGains:
+    """Per-market ring buffers of ask prices over several time windows.
+
+    Each market has one buffer, long enough for the largest window. The
+    other windows are offsets into it, so a sample is stored once however
+    many windows are tracked.
+
+    Args:
+        windows (iterable): window lengths in seconds.
+        resolution (float): a sample arriving sooner than this after the
+            previous stored one only updates the current ask. The stream
+            sends about one ticker a second per market, so this bounds the
+            buffer of the largest window to `window / resolution` samples.
+    """
+
+    def __init__(self, windows=WINDOWS, resolution=RESOLUTION):
+        self.windows = tuple(sorted(windows))
+        self.resolution = resolution
+        self.slots = dict()
+        "symbol -> index into every list below"
+        self.names = list()
+        self.current = list()
+        self.volumes = list()
+        self.first_seen = list()
+        self.samples = list()
+        "one deque of (time, ask) per symbol, covering the largest window"
+        self.heads = list()
+        "per symbol, the index in its deque where each window starts"
+        self.last_update = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _slot(self, symbol, when):
+        slot = self.slots.get(symbol)
+        if slot is None:
+            slot = self.slots[symbol] = len(self.names)
+            self.names.append(symbol)
+            self.current.append(numpy.nan)
+            self.volumes.append(numpy.nan)
+            self.first_seen.append(when)
+            self.samples.append(collections.deque())
+            self.heads.append([0] * len(self.windows))
+        return slot
+
+    def update(self, symbol, when, ask, volume=numpy.nan):
+        "Record one ask price. O(1) amortised per window."
+        with self.lock:
+            slot = self._slot(symbol, when)
+            self.current[slot] = ask
+            self.volumes[slot] = volume
+            self.last_update = max(self.last_update, when)
+
+            samples = self.samples[slot]
+            if samples and when - samples[-1][0] < self.resolution:
+                return
+            samples.append((when, ask))
+
+            heads = self.heads[slot]
+            for index, window in enumerate(self.windows):
+                while samples[heads[index]][0] < when - window:
+                    heads[index] += 1
+
+            # The largest window starts furthest back; what precedes it is
+            # outside every window.
+            expired = heads[-1]
+            for _ in range(expired):
+                samples.popleft()
+            if expired:
+                self.heads[slot] = [head - expired for head in heads]
+
+    def update_from_message(self, message):
+        """Record every ticker in a WebSocket frame.
+
+        Returns:
+            int: the number of tickers recorded.
+        """
+        tickers = parse_tickers(message)
+        for symbol, when, ask, volume in tickers:
+            self.update(symbol, when, ask, volume)
+        return len(tickers)
+
+    def arrays(self, window):
+        """The inputs of a surge ranking over `window` seconds.
+
+        Markets seen for less than `window` seconds have no reference price
+        yet, so their previous ask is NaN and they cannot be ranked.
+
+        Returns:
+            tuple: (names, current asks, asks `window` seconds ago, volumes)
+        """
+        with self.lock:
+            names = list(self.names)
+            current = numpy.array(self.current, dtype=float)
+            volumes = numpy.array(self.volumes, dtype=float)
+            index = self.windows.index(window)
+            previous = numpy.array(
+                [samples[heads[index]][1]
+                 for samples, heads in zip(self.samples, self.heads)],
+                dtype=float)
+            first_seen = numpy.array(self.first_seen, dtype=float)
+
+        previous[first_seen > self.last_update - window] = numpy.nan
+        return names, current, previous, volumes
+
+    def gains(self, window):
+        """Percent gain of every market over `window` seconds.
+
+        Returns:
+            dict: symbol -> percent gain, for markets with a full window.
+        """
+        names, current, previous, _ = self.arrays(window)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            gains = (current - previous) / previous * 100
+        return {
+            name: float(gain)
+            for name, gain in zip(names, gains) if numpy.isfinite(gain)
+        }
+
+
+def listen(url, on_message, reconnect=True):
+    """Consume a WebSocket stream, passing each frame to `on_message`.
+
+    Args:
+        url (str): STREAM_URL, or a ReplayServer's url.
+        on_message (callable): called with the text of every frame.
+        reconnect (bool): reconnect after the stream drops.
+    """
+    def _on_message(_socket, message):
+        try:
+            on_message(message)
+        except Exception:
+            LOGGER.exception("Failed to handle stream frame")
+
+    while True:
+        app = websocket.WebSocketApp(url, on_message=_on_message)
+        app.run_forever()
+        if not reconnect:
+            return
+        print("Stream {} closed. Reconnecting in {}s".format(
+            url, RECONNECT_DELAY))
+        time.sleep(RECONNECT_DELAY)
+
+
+def watch(inis, url=STREAM_URL, windows=WINDOWS, window=3600,
+          evaluate_every=10, cooldown=3600, depth_symbols=0, reconnect=True):
+    """Buy surging coins as soon as the ticker stream shows them.
+
+    Args:
+        inis (list): the user ini files to buy for.
+        url (str): the ticker stream.
+        windows (iterable): windows to track, in seconds.
+        window (int): the window whose gain is ranked against min_gain.
+        evaluate_every (float): seconds between rankings.
+        cooldown (float): seconds before a market that triggered buys may
+            trigger them again. Only the markets within the largest `top`
+            of the users count as having triggered.
+        depth_symbols (int): keep live order books of this many of the
+            top-ranked markets. 0 disables the depth cache.
+        reconnect (bool): keep listening after the stream drops. Without
+            it, watch returns once the stream closes and its buys finish.
+    """
+    from . import buy
+    from . import config
+    from . import depthcache
+    from . import mybinance
+    from . import scoring
+
+    tracker = RollingGains(set(windows) | {window})
+    state = {'evaluated': 0}
+    bought = dict()
+    "symbol -> time it last triggered a buy"
+
+    # Buys place orders over REST. They run on their own thread so the
+    # stream keeps being read while they do. One buy may wait behind the
+    # running one; surges seen meanwhile are dropped and seen again at the
+    # next evaluation, as their markets are not cooling down.
+    pending = queue.Queue(maxsize=1)
+
+    def buyer():
+        while True:
+            analysis = pending.get()
+            try:
+                buy.main(inis, analysis)
+            except Exception:
+                LOGGER.exception("Stream-triggered buy failed")
+            finally:
+                pending.task_done()
+
+    threading.Thread(target=buyer, name='stream-buyer', daemon=True).start()
+
+    def evaluate():
+        names, current, previous, volumes = tracker.arrays(window)
+        analysis = buy.make_analysis(names, current, previous, volumes)
+
+        now = tracker.last_update
+        cooling = numpy.array(
+            [now - bought.get(name, -cooldown) < cooldown for name in names],
+            dtype=bool)
+        analysis = analysis._replace(skip=analysis.skip | cooling)
+
+        # Open orders are per user; buy.main applies them.
+        sys_config = config.system()
+        ranking = scoring.rank(
+            names, analysis.current, analysis.previous, analysis.volumes,
+            numpy.zeros(len(names), dtype=int), analysis.skip,
+            min_volume=sys_config.min_volume, min_price=sys_config.min_price,
+            max_orders=1)
+        if depth_symbols and inis:
+            exchange = mybinance.make_binance(config.user(inis[0]).config)
+            depthcache.start(
+                exchange, [ranked[0] for ranked in ranking[:depth_symbols]])
+
+        surging = [
+            ranked for ranked in ranking if ranked[1] >= sys_config.min_gain]
+        if not surging:
+            return
+
+        try:
+            pending.put_nowait(analysis)
+        except queue.Full:
+            print("Stream surge over {}s waits for the previous buy".format(
+                window))
+            return
+
+        print("Stream surge over {}s: {}".format(window, surging[:5]))
+        # Each user buys only their `top` coins. The rest may still be
+        # bought at the next evaluation, so only those cool down.
+        buyable = max(config.user(ini).trade_top for ini in inis)
+        for ranked in surging[:buyable]:
+            bought[ranked[0]] = now
+
+    def on_message(message):
+        tracker.update_from_message(message)
+        if tracker.last_update - state['evaluated'] >= evaluate_every:
+            state['evaluated'] = tracker.last_update
+            evaluate()
+
+    listen(url, on_message, reconnect=reconnect)
+    pending.join()
+
+
+def recorded_frames(path):
+    """Load frames recorded one per line, e.g. with `record`.
+
+    Returns:
+        list: the frames, as text.
+    """
+    with open(path) as frames_file:
+        return [line.rstrip('\n') for line in frames_file if line.strip()]
+
+
+def record(url, path, limit):
+    "Append `limit` frames of a live stream to `path`, one per line."
+    count = [0]
+
+    with open(path, 'a') as frames_file:
+        def on_message(_socket, message):
+            frames_file.write(message.replace('\n', '') + '\n')
+            count[0] += 1
+            if count[0] >= limit:
+                _socket.close()
+
+        websocket.WebSocketApp(url, on_message=on_message).run_forever()
+
+
+def archive_frames(start=None, end=None):
+    """Turn the download archive into `!ticker@arr` frames.
+
+    Yields:
+        str: one frame per archived download.
+    """
+    for taken_at, tickers in archive.snapshots(start, end):
+        event_time = int(taken_at.timestamp() * 1000)
+        yield json.dumps([
+            {
+                'e': '24hrTicker',
+                'E': event_time,
+                's': ticker['symbol'],
+                'a': ticker['askPrice'],
+                'q': ticker.get('quoteVolume', 'nan'),
+            }
+            for ticker in tickers
+        ])
+
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def encode_frame(text):
+    "An unmasked server-to-client WebSocket text frame."
+    payload = text.encode('utf-8')
+    header = bytearray([0x81])
+    if len(payload) < 126:
+        header.append(len(payload))
+    elif len(payload) < 1 << 16:
+        header.append(126)
+        header += struct.pack('>H', len(payload))
+    else:
+        header.append(127)
+        header += struct.pack('>Q', len(payload))
+    return bytes(header) + payload
+
+
+class _ReplayHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        self.rfile.readline()
+        headers = dict()
+        for line in iter(self.rfile.readline, b''):
+            line = line.decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        accept = base64.b64encode(hashlib.sha1(
+            (headers['sec-websocket-key'] + WEBSOCKET_GUID).encode()
+        ).digest()).decode()
+        self.wfile.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            "Sec-WebSocket-Accept: {}\r\n\r\n".format(accept)
+        ).encode())
+
+        for frame in self.server.frames:
+            self.wfile.write(encode_frame(frame))
+            if self.server.delay:
+                time.sleep(self.server.delay)
+
+        # Close frame
+        self.wfile.write(b'\x88\x00')
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    """A local stand-in for the Binance ticker stream.
+
+    Every client that connects receives all `frames`, `delay` seconds
+    apart, and is then disconnected.
+
+    Args:
+        frames (iterable): the text frames to send.
+        port (int): 0 picks a free port.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, frames, port=0, delay=0):
+        super().__init__(('127.0.0.1', port), _ReplayHandler)
+        self.frames = list(frames)
+        self.delay = delay
+
+    @property
+    def base(self):
+        "The address to use as `depthcache.DepthCache`'s stream_base."
+        return "ws://127.0.0.1:{}".format(self.server_address[1])
+
+    @property
+    def url(self):
+        return self.base + "/ws/!ticker@arr"
+
+    def start(self):
+        "Serve from a background thread."
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -1,144 +1,283 @@
-#!/usr/bin/env python
-
-#Completed by AJV 02/03/2018
-
-# core
-import logging
-import pprint
-
-# pypi
-
-# local
-from . import mybinance
-from .db import db
-
-
-
-logging.basicConfig(
-    format='%(lineno)s %(message)s',
-    level=logging.WARN
-)
-
-ONE_PERCENT = 1.0 / 100.0
-TWO_PERCENT = 2.0 / 100.0
-
-
-LOGGER = logging.getLogger(__name__)
-
-
-
-def single_and_double_satoshi_scalp(price):
-    # forget it - huge sell walls in these low-satoshi coins!
-    return price + 2e-8
-
-
-def __takeprofit(entry, gain):
-
-    x_percent = gain / 100.0
-    profit_target = entry * x_percent + entry
-
-    print(("On an entry of {0:.8f}, TP={1:.8f} for a {2} percent gain".format(
-        entry, profit_target, gain)))
-
-    return profit_target
-
-def _takeprofit(exchange, percent, row):
-
-    profit_target = __takeprofit(entry=row.purchase_price, gain=percent)
-
-    #amount_to_sell = order['Quantity'] - 1e-8
-    #amount_to_sell = order['Quantity']
-    amount_to_sell = row['amount']
-
-    print("b.order_limit_sell({}, {}, {})".format(row.market, amount_to_sell, profit_target))
-    result = exchange.order_limit_sell(symbol = row.market, quantity = amount_to_sell, price = profit_target)
-    pprint.pprint(result)
-
-    #TODO how do I get it to know if the sell closed
-    if result['status']:
-        row.update_record(selling_price=profit_target, sell_id=result['orderId'])
-        db.commit()
-
-
-#@retry()
-def takeprofit(config_file, exchange, percent):
-
-    rows = db((db.buy.selling_price == None) & (db.buy.config_file == config_file)).select()
-    for row in rows:
-        print("\t", row)
-
-        # if row['config_file'] != config_file:
-        #     print "my config file is {} but this one is {}. skipping".format(
-        #         config_file, row['config_file'])
-        #     continue
-
-        order = exchange.get_order(symbol = row['market'], orderId = row['order_id'])
-        print("unsold row {}".format(pprint.pformat(order)))
-        if order['status']=="FILLED":
-            _takeprofit(exchange, percent, row)
-        else:
-            print("""Buy has not been filled. Cannot sell for profit until it does.
-                  You may want to manually cancel this buy order.""")
-
-
-def _clearprofit(exchange, row):
-
-    print("Clearing Profit for {}".format(row))
-
-    #Changed by AJV 01/23/2018
-    result = exchange.cancel_order(symbol = row['market'], orderId = row['sell_id'])
-
-    if result['orderId']:
-        print("\t\tSuccess: {}".format(result))
-        row.update_record(selling_price=None, sell_id=None)
-        db.commit()
-    else:
-        raise Exception("Order cancel failed: {}".format(result))
-
-def clearorder(exchange, sell_id):
-    row = db((db.buy.sell_id == sell_id)).select().first()
-    if not row:
-        raise Exception("Could not find row with sell_id {}".format(sell_id))
-
-    _clearprofit(exchange, row)
-
-def clear_order_id(exchange, sell_order_id):
-    "Used in conjunction with `invoke clearorderid`"
-    clearorder(exchange, sell_order_id)
-
-
-def clearprofit(exchange):
-    "Used in conjunction with `invoke cancelsells`"
-    openorders = exchange.get_open_orders()
-    count = 0
-    for openorder in openorders:
-        if openorder['OrderType'] == 'LIMIT':
-            count += 1
-            print("{}: {} --->{}".format(count, openorder, openorder['OrderUuid']))
-            clearorder(exchange, openorder['OrderUuid'])
-
-#    rows = db((db.buy.sell_id != None) & (db.buy.config_file == config_file)).select()
-#    for i, row in enumerate(rows):
-#        print("  -- Row {}".format(i))
-#        clearorder(exchange, row)
-
-
-def prep(config_file):
-    from users import users
-
-    config = users.read(config_file)
-    exchange = mybinance.make_binance(config)
-    return config, exchange
-
-def take_profit(config_file):
-
-    config, exchange = prep(config_file)
-    percent = float(config.get('trade', 'takeprofit'))
-
-    print("Setting profit targets for {}".format(config_file))
-
-    takeprofit(config_file, exchange, percent)
-
-def clear_profit(config_file):
-    _, exchange = prep(config_file)
-    clearprofit(exchange)
+#!/usr/bin/env python
+
+#Completed by AJV 02/03/2018
+
+# core
+import collections
+import datetime
+import logging
+import pprint
+
+# pypi
+
+# local
+import lib.config
+from . import mybinance
+from .db import db
+from .orders import fetch_history
+
+
+
+logging.basicConfig(
+    format='%(lineno)s %(message)s',
+    level=logging.WARN
+)
+
+ONE_PERCENT = 1.0 / 100.0
+TWO_PERCENT = 2.0 / 100.0
+
+
+LOGGER = logging.getLogger(__name__)
+
+CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+"A claim on a buy row older than this was abandoned by a crashed seller."
+
+RETIRED = ('CANCELED', 'EXPIRED', 'REJECTED')
+"Statuses of buys that ended without filling; takeprofit stops polling them."
+
+
+def single_and_double_satoshi_scalp(price):
+    # forget it - huge sell walls in these low-satoshi coins!
+    return price + 2e-8
+
+
+def __takeprofit(entry, gain):
+
+    x_percent = gain / 100.0
+    profit_target = entry * x_percent + entry
+
+    print(("On an entry of {0:.8f}, TP={1:.8f} for a {2} percent gain".format(
+        entry, profit_target, gain)))
+
+    return profit_target
+
+def mark_filled(row):
+    "Record that the buy in `row` filled, and when it was first seen filled."
+    if row.filled_at is None or row.status != 'FILLED':
+        row.update_record(
+            status='FILLED', filled_at=row.filled_at or datetime.datetime.now())
+        db.commit()
+
+
+def retire(row, order):
+    """Settle a buy that ended with status `order['status']` in RETIRED.
+
+    Whatever part of it filled before it ended is sold like a filled buy:
+    `amount` becomes the executed quantity and the row is marked FILLED.
+    A buy that executed nothing keeps the status so it is not polled again.
+
+    Returns:
+        bool: True if the row has a quantity left to sell.
+    """
+    executed = float(order.get('executedQty') or 0)
+    if executed > 0:
+        print("Buy {} was {} after filling {} of {}.".format(
+            row.order_id, order['status'], executed, row.amount))
+        row.update_record(amount=executed)
+        mark_filled(row)
+        return True
+
+    print("Buy {} was {}; nothing to sell.".format(
+        row.order_id, order['status']))
+    row.update_record(status=order['status'])
+    db.commit()
+    return False
+
+
+def claim(row):
+    """Reserve the sell of `row` for this caller.
+
+    takeprofit and userstream may both see the same fill. The UPDATE only
+    matches while nobody has sold or claimed the row, so exactly one of
+    them gets it.
+
+    Returns:
+        bool: True if this caller may place the sell.
+    """
+    now = datetime.datetime.now()
+    claimed = db(
+        (db.buy.id == row.id) &
+        (db.buy.selling_price == None) &
+        ((db.buy.claimed_at == None) | (db.buy.claimed_at < now - CLAIM_TIMEOUT))
+    ).update(claimed_at=now)
+    db.commit()
+    return bool(claimed)
+
+
+def release(row):
+    "Give up the claim on `row` so the sell is tried again."
+    db(db.buy.id == row.id).update(claimed_at=None)
+    db.commit()
+
+
+def _takeprofit(exchange, percent, row):
+
+    if not claim(row):
+        print("Buy {} is already being sold.".format(row.order_id))
+        return False
+
+    try:
+        return _sell(exchange, percent, row)
+    except Exception:
+        release(row)
+        raise
+
+
+def _sell(exchange, percent, row):
+
+    profit_target = __takeprofit(entry=row.purchase_price, gain=percent)
+
+    #amount_to_sell = order['Quantity'] - 1e-8
+    #amount_to_sell = order['Quantity']
+    amount_to_sell = row['amount']
+
+    print("b.order_limit_sell({}, {}, {})".format(row.market, amount_to_sell, profit_target))
+    result = exchange.order_limit_sell(symbol = row.market, quantity = amount_to_sell, price = profit_target)
+    pprint.pprint(result)
+
+    #TODO how do I get it to know if the sell closed
+    if result['status']:
+        row.update_record(selling_price=profit_target, sell_id=result['orderId'])
+        db.commit()
+        return True
+
+    release(row)
+    return False
+
+
+def _orders_of_symbol(exchange, symbol, order_ids):
+    """Fetch the orders `order_ids` of one symbol in as few calls as possible.
+
+    A single order costs one get_order. Several are read with get_all_orders
+    starting at the oldest id, paging on until every id is found or the
+    history runs out.
+
+    Returns:
+        dict: order id (as a string) -> order
+    """
+    if len(order_ids) == 1:
+        order_id, = order_ids
+        return {order_id: exchange.get_order(symbol=symbol, orderId=order_id)}
+
+    wanted = set(order_ids)
+    orders = dict()
+    start = min(int(order_id) for order_id in order_ids)
+    for order in fetch_history(exchange, symbol, start):
+        order_id = str(order['orderId'])
+        if order_id in wanted:
+            orders[order_id] = order
+            if len(orders) == len(wanted):
+                break
+    return orders
+
+
+def reconcile(exchange, rows):
+    """Look up the exchange's view of the buy orders in `rows`.
+
+    The API cost is one call per market instead of one per row.
+
+    Returns:
+        dict: order id (as a string) -> order. Orders the exchange did not
+        return are missing.
+    """
+    order_ids = collections.defaultdict(set)
+    for row in rows:
+        order_ids[row['market']].add(str(row['order_id']))
+
+    orders = dict()
+    for symbol, ids in order_ids.items():
+        orders.update(_orders_of_symbol(exchange, symbol, ids))
+    return orders
+
+
+#@retry()
+def takeprofit(config_file, exchange, percent):
+
+    rows = db(
+        (db.buy.selling_price == None) &
+        (db.buy.config_file == config_file) &
+        ((db.buy.status == None) | ~db.buy.status.belongs(RETIRED))
+    ).select()
+    orders = reconcile(exchange, rows)
+    for row in rows:
+        print("\t", row)
+
+        order = orders.get(str(row['order_id']))
+        if order is None:
+            print("Buy {} was not found on the exchange.".format(row['order_id']))
+            continue
+
+        print("unsold row {}".format(pprint.pformat(order)))
+        if order['status']=="FILLED":
+            mark_filled(row)
+            _takeprofit(exchange, percent, row)
+        elif order['status'] in RETIRED:
+            if retire(row, order):
+                _takeprofit(exchange, percent, row)
+        else:
+            if row.status != order['status']:
+                row.update_record(status=order['status'])
+                db.commit()
+            print("""Buy has not been filled. Cannot sell for profit until it does.
+                  You may want to manually cancel this buy order.""")
+
+
+def _clearprofit(exchange, row):
+
+    print("Clearing Profit for {}".format(row))
+
+    #Changed by AJV 01/23/2018
+    result = exchange.cancel_order(symbol = row['market'], orderId = row['sell_id'])
+
+    if result['orderId']:
+        print("\t\tSuccess: {}".format(result))
+        row.update_record(selling_price=None, sell_id=None, claimed_at=None)
+        db.commit()
+    else:
+        raise Exception("Order cancel failed: {}".format(result))
+
+def clearorder(exchange, sell_id):
+    row = db((db.buy.sell_id == sell_id)).select().first()
+    if not row:
+        raise Exception("Could not find row with sell_id {}".format(sell_id))
+
+    _clearprofit(exchange, row)
+
+def clear_order_id(exchange, sell_order_id):
+    "Used in conjunction with `invoke clearorderid`"
+    clearorder(exchange, sell_order_id)
+
+
+def clearprofit(exchange):
+    "Used in conjunction with `invoke cancelsells`"
+    openorders = exchange.get_open_orders()
+    count = 0
+    for openorder in openorders:
+        if openorder['OrderType'] == 'LIMIT':
+            count += 1
+            print("{}: {} --->{}".format(count, openorder, openorder['OrderUuid']))
+            clearorder(exchange, openorder['OrderUuid'])
+
+#    rows = db((db.buy.sell_id != None) & (db.buy.config_file == config_file)).select()
+#    for i, row in enumerate(rows):
+#        print("  -- Row {}".format(i))
+#        clearorder(exchange, row)
+
+
+def prep(config_file):
+    user_config = lib.config.user(config_file)
+    exchange = mybinance.make_binance(user_config.config)
+    return user_config, exchange
+
+def take_profit(config_file):
+
+    user_config, exchange = prep(config_file)
+    percent = user_config.trade_takeprofit
+
+    print("Setting profit targets for {}".format(config_file))
+
+    takeprofit(config_file, exchange, percent)
+
+def clear_profit(config_file):
+    _, exchange = prep(config_file)
+    clearprofit(exchange)
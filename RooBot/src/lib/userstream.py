@@ -0,0 +1,206 @@
+"""Place take-profit sells the moment a buy fills.
+
+`invoke takeprofit` polls every few minutes, so a filled buy can sit
+without a profit target until the next run. `UserStream` instead listens to
+an account's user data stream. Binance pushes an `executionReport` event
+whenever one of the account's orders changes. When a BUY reaches FILLED,
+its `buy` row is marked filled and the take-profit sell is placed at once
+through `lib.takeprofit._takeprofit`, which claims the row first so a
+concurrent `invoke takeprofit` cannot sell it twice.
+
+A fill can be reported before `_buycoin` has recorded the buy. Such fills
+are kept and looked up again every UNMATCHED_RETRY seconds. After
+UNMATCHED_TTL they are dropped and `invoke takeprofit` sells the buy.
+
+The stream is opened with a listen key, which expires 60 minutes after its
+last keepalive. A background thread renews it every KEEPALIVE seconds.
+
+Pointing `stream_base` at a `stream.ReplayServer` replays recorded
+events, so this can be exercised without Binance:
+
+        server = stream.ReplayServer(frames).start()
+        UserStream(ini, exchange, 5, stream_base=server.base).run()
+"""
+
+# core
+import json
+import logging
+import threading
+import time
+
+# local
+from . import stream
+from . import takeprofit
+from .db import db
+
+LOGGER = logging.getLogger(__name__)
+
+STREAM_BASE = 'wss://stream.binance.com:9443'
+
+KEEPALIVE = 30 * 60
+"Seconds between listen key renewals. Keys expire after 60 minutes."
+
+UNMATCHED_RETRY = 5
+"Seconds between lookups of fills whose buy was not recorded yet."
+
+UNMATCHED_TTL = 10 * 60
+"Seconds a fill is looked up before it is left to `invoke takeprofit`."
+
+
+def is_filled_buy(event):
+    "True if `event` reports that a BUY order filled completely."
+    return (
+        event.get('e') == 'executionReport' and
+        event.get('S') == 'BUY' and
+        event.get('X') == 'FILLED'
+    )
+
+
+class UserStream:
+    """The user data stream of one account.
+
+    Args:
+        config_file (str): the user ini file whose buys are handled.
+        exchange: the account's client.
+        percent (float): the take-profit gain, as in `invoke takeprofit`.
+        stream_base (str): STREAM_BASE or a replay server's address.
+        keepalive (float): seconds between listen key renewals.
+    """
+
+    def __init__(self, config_file, exchange, percent,
+                 stream_base=STREAM_BASE, keepalive=KEEPALIVE):
+        self.config_file = config_file
+        self.exchange = exchange
+        self.percent = percent
+        self.stream_base = stream_base
+        self.keepalive = keepalive
+        self.listen_key = None
+        self.stopped = threading.Event()
+        self.unmatched = dict()
+        "order id -> (fill event, time first seen) of unrecorded buys"
+        self.lock = threading.Lock()
+
+    def _sell(self, event):
+        """Sell the filled buy of `event`.
+
+        Returns:
+            bool: True if a take-profit sell was placed. None if the buy is
+            not recorded (yet).
+        """
+        order_id = str(event['i'])
+        row = db(
+            (db.buy.config_file == self.config_file) &
+            (db.buy.order_id == order_id)
+        ).select().first()
+        if row is None:
+            return None
+        if row.selling_price is not None:
+            # Already sold.
+            return False
+
+        print("Buy {} of {} filled".format(order_id, event['s']))
+        takeprofit.mark_filled(row)
+        return takeprofit._takeprofit(self.exchange, self.percent, row)
+
+    def on_event(self, event):
+        """Handle one user data event.
+
+        Returns:
+            bool: True if a take-profit sell was placed.
+        """
+        if not is_filled_buy(event):
+            return False
+
+        sold = self._sell(event)
+        if sold is None:
+            # Not one of our buys, or one _buycoin has not recorded yet.
+            with self.lock:
+                self.unmatched.setdefault(
+                    str(event['i']), (event, time.time()))
+            return False
+        return sold
+
+    def retry_unmatched(self, now=None):
+        """Look up the fills whose buys were not recorded yet.
+
+        Returns:
+            int: the number of take-profit sells placed.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            unmatched = list(self.unmatched.items())
+
+        placed = 0
+        for order_id, (event, seen_at) in unmatched:
+            sold = self._sell(event)
+            if sold is None and now - seen_at < UNMATCHED_TTL:
+                continue
+            if sold is None:
+                LOGGER.info("Buy %s of %s is not recorded; leaving it to "
+                            "takeprofit", order_id, self.config_file)
+            placed += bool(sold)
+            with self.lock:
+                self.unmatched.pop(order_id, None)
+        return placed
+
+    def _retry(self):
+        while not self.stopped.wait(UNMATCHED_RETRY):
+            try:
+                self.retry_unmatched()
+            except Exception:
+                LOGGER.exception("Could not sell the unmatched fills of %s",
+                                 self.config_file)
+
+    def on_message(self, message):
+        self.on_event(json.loads(message))
+
+    def renew(self):
+        "Keep the listen key alive."
+        self.exchange.stream_keepalive(listenKey=self.listen_key)
+
+    def _keep_alive(self):
+        while not self.stopped.wait(self.keepalive):
+            try:
+                self.renew()
+            except Exception:
+                LOGGER.exception("Could not renew the listen key of %s",
+                                 self.config_file)
+
+    def run(self, reconnect=False):
+        """Listen until the stream closes, or forever with `reconnect`."""
+        renewer = threading.Thread(target=self._keep_alive, daemon=True)
+        renewer.start()
+        threading.Thread(target=self._retry, daemon=True).start()
+        try:
+            while not self.stopped.is_set():
+                # An active key is returned again, so this is cheap.
+                self.listen_key = self.exchange.stream_get_listen_key()
+                stream.listen(
+                    "{}/ws/{}".format(self.stream_base, self.listen_key),
+                    self.on_message, reconnect=False)
+                if not reconnect:
+                    break
+                time.sleep(stream.RECONNECT_DELAY)
+        finally:
+            self.stopped.set()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def watch(inis, stream_base=STREAM_BASE):
+    "Listen to the user data stream of every user in `inis`."
+    threads = list()
+    for config_file in inis:
+        user_config, exchange = takeprofit.prep(config_file)
+        user_stream = UserStream(
+            config_file, exchange, user_config.trade_takeprofit,
+            stream_base=stream_base)
+        thread = threading.Thread(
+            target=user_stream.run, kwargs={'reconnect': True}, daemon=True)
+        thread.start()
+        threads.append(thread)
+        print("Listening for fills of {}".format(config_file))
+
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,96 @@
+"""Run per-user work on a bounded pool of threads.
+
+`invoke buy`, `invoke takeprofit` and `invoke cancelsells` do the same work
+for every user ini. Each user only blocks on their own Binance calls, so
+running users side by side means the last user in the list trades almost
+as soon as the first. The pool size comes from the `[execution]` section of
+system.ini and defaults to 1, which keeps the old sequential behaviour.
+
+Every user runs in isolation: an exception is reported for that user and
+the others carry on. Once every user is done, the time each one took is
+printed, and `UserTaskError` is raised if any of them failed.
+
+Example:
+
+        workers.for_each_user(lib.takeprofit.take_profit, inis,
+                              lib.config.system().execution_workers,
+                              label='takeprofit')
+"""
+
+# core
+import concurrent.futures
+import logging
+import time
+import traceback
+
+LOGGER = logging.getLogger(__name__)
+
+
+class UserTaskError(Exception):
+    """Raised after a run in which the task failed for one or more users.
+
+    Attributes:
+        failures -- dict of ini file -> exception
+    """
+
+    def __init__(self, label, failures):
+        super().__init__()
+        self.failures = failures
+        self.message = "{} failed for {}".format(label, sorted(failures))
+
+    def __str__(self):
+        return self.message
+
+
+def _timed(func, ini):
+    "Call func(ini) and return (seconds taken, result, exception)."
+    started = time.time()
+    try:
+        result, error = func(ini), None
+    except Exception as exc:
+        print("{} raised:\n{}".format(ini, traceback.format_exc()))
+        result, error = None, exc
+    return time.time() - started, result, error
+
+
+def for_each_user(func, inis, workers=1, label=None):
+    """Call `func(ini)` for every ini, running up to `workers` at a time.
+
+    Args:
+        func (callable): the per-user task. It receives the ini file name.
+        inis (list): the user ini files to process.
+        workers (int): the size of the thread pool. 1 runs in this thread.
+        label (str): names the task in the latency report.
+
+    Returns:
+        dict: ini file -> the value `func` returned for it.
+
+    Raises:
+        UserTaskError: if `func` raised for any ini.
+    """
+    label = label or getattr(func, '__name__', 'task')
+    outcomes = dict()
+
+    if workers <= 1 or len(inis) <= 1:
+        for ini in inis:
+            outcomes[ini] = _timed(func, ini)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=label) as pool:
+            futures = {ini: pool.submit(_timed, func, ini) for ini in inis}
+            for ini, future in futures.items():
+                outcomes[ini] = future.result()
+
+    print("<{} latency workers={}>".format(label, workers))
+    for ini, (seconds, _, error) in outcomes.items():
+        line = "\t{}: {:.2f}s{}".format(
+            ini, seconds, " FAILED" if error else "")
+        print(line)
+        LOGGER.info("%s %s", label, line.strip())
+    print("</{} latency>".format(label))
+
+    failures = {ini: error for ini, (_, _, error) in outcomes.items() if error}
+    if failures:
+        raise UserTaskError(label, failures)
+
+    return {ini: result for ini, (_, result, _) in outcomes.items()}
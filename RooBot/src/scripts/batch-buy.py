@@ -1,7 +1,7 @@
-#Reviewed by AJV 01/23/2018
-from . import inis
-
-INI = inis.INI
-
-from . import buy
-buy.main(INI)
+#Reviewed by AJV 01/23/2018
+from . import inis
+
+INI = inis.INI
+
+from . import buy
+buy.main(INI)
@@ -1,8 +1,8 @@
-#Reviewed by AJV 01/23/2018
-import random
-
-from . import inis
-INI = inis.INI.split()
-
-from . import download
-download.main(random.choice(INI))
+#Reviewed by AJV 01/23/2018
+import random
+
+from . import inis
+INI = inis.INI.split()
+
+from . import download
+download.main(random.choice(INI))
@@ -1 +1 @@
-DELETE FROM market WHERE timestamp <= date('now', '-2 day');
+DELETE FROM market WHERE timestamp <= date('now', '-2 day');
@@ -1,255 +1,332 @@
-#Reviewed by AJV 02/03/2018
-"""Define a collection of tasks invokable from the command-line/cron.
-
-This module leverages `PyInvoke`_ to create tasks relevant ot the execution
-of RooBot. The tasks are ordered in this module in the order that you
-would typically use them:
-    1. you would download the market data via `invoke download`
-    1. The next hour you would download the market data again.
-    1. Then `invoke buy` to buy the coins with the strongest gain.
-    1. Then `invoke takeprofit` to set profit targets for your buys.
-    1. Then `invoke profitreport -d yesterday` to see what profits you made
-    1. Then `invoke cancelsells` to cancel all sell orders so that
-    `invoke takeprofit` then re-issue them.
-    1. On rare occassions, you might liquidate all coins in your portfolio,
-    cancelling all open sell orders. This is usually done when you are
-    restarting / abandoning RooBot usage.
-
-Example:
-
-        $ invoke download
-
-Todo:
-    * For module TODOs
-    * You have to also use ``sphinx.ext.todo`` extension
-
-.. _PyInvoke:
-   http://www.pyinvoke.org/
-"""
-
-# core
-import logging
-import random
-
-# 3rd party
-from invoke import task
-
-#local
-import lib.config
-import lib.logconfig
-import lib.report.profit
-import lib.takeprofit
-
-
-
-#TODO
-SYS_INI = lib.config.System()
-
-LOG = logging.getLogger('app')
-
-
-def listify_ini(ini, randomize=False):
-    """Coerce the ini argument to a list of 1+ ini-file names.
-
-    When provided with a value V, return a list consisting solely of V.
-    When no value is provided, return a list consisting of the ini files of
-    all active users:
-
-    Args:
-        ini (str): The name of an ini file or a falsy value.
-
-    Returns:
-        A list of 1+ ini-file names
-
-    """
-    if ini:
-        inis = [ini]
-    else:
-        inis = SYS_INI.users_inis
-        if randomize:
-            random.shuffle(inis)
-
-    return inis
-
-@task
-def download(_ctx):
-    """Download the current price data for all markets on Binance.
-
-    Call getmarketsummaries via `the Binance API`_ and place the JSON
-    file in src/tmp.
-
-    Args:
-        None other than the PyInvoke context object.
-
-    Returns:
-        Nothing.
-
-    .. _the Binance API:
-        https://api.binance.com/api/v1/
-
-    """
-    from lib import download as _download
-
-    _download.main(random.choice(SYS_INI.users_inis))
-
-
-@task
-def buy(_ctx, ini=None):
-    """Analyze market data (obtained via `invoke download`) and buy coins.
-
-    Buy compares last hour's market data with this hour and find the coin(s)
-    that have shown the most growth in an hour. It filters out certain coins
-    based on certain criteria. And then buy the top N coin(s).
-
-    Returns:
-        Nothing.
-    """
-    from lib import buy as _buy
-
-    inis = listify_ini(ini, randomize=False)
-    _buy.main(inis)
-
-
-@task
-def takeprofit(_ctx, ini=None):
-    """Issue SELL LIMIT orders on the coin(s) that have been bought.
-
-    Every 5 minutes this task runs to see if any new coins have been bought.
-    If so, it then sets a profit target for them.
-    """
-
-    inis = listify_ini(ini)
-
-    for _ in inis:
-        LOG.debug("Processing {}".format(_))
-        lib.takeprofit.take_profit(_)
-
-@task
-def profitreport(_ctx, ini=None, date_string=None, skip_markets=None):
-    """Generate and email a profit report for a certain time frame.
-
-    Args:
-        ini (str): The name of an ini file or a falsy value.
-        date_string : "yesterday" and "lastmonth" are valid values
-        skip_markets: Coins to exclude from calculating the profit report.
-            This is used when a market is under maintenance becauase at that
-            point the exchange API does not return data for that coin.
-
-    Returns:
-        Nothing. It dumps a csv and html of the email profit report in src/tmp.
-
-    """
-
-    inis = listify_ini(ini)
-
-    if date_string:
-        from datetime import date
-        if date_string == 'yesterday':
-            date_string = "Yesterday"
-            _date = date.fromordinal(date.today().toordinal()-1)
-        elif date_string == 'lastmonth':
-            date_string = "Last month"
-            from dateutil.relativedelta import relativedelta
-            today = date.today()
-            diff = today - relativedelta(months=1)
-            start_of_last_month = date(diff.year, diff.month, 1)
-            end_of_last_month = date(today.year, today.month, 1) - relativedelta(days=1)
-            print("Date range for profit report. Start={}. End={}".format(
-                start_of_last_month, end_of_last_month))
-            _date = [start_of_last_month, end_of_last_month]
-        else:
-            raise Exception("Unrecognized date option")
-    else:
-        _date = None
-
-    if skip_markets:
-        skip_markets = skip_markets.split()
-
-    for user_ini in inis:
-        LOG.debug("Processing {}".format(user_ini))
-        lib.report.profit.main(user_ini, date_string, _date=_date, skip_markets=skip_markets)
-
-
-
-@task
-def cancelsells(_ctx, ini=None):
-    """Cancel sell orders so that `invoke takeprofit` can re-issue them.
-
-    Binance implemented a policy where a SELL LIMIT order can only be active
-    for 28 days. After that, they close the order. The purpose of this code is
-    to cancel and re-issue the order so that it remains active as long as
-    necessary to close for a profit.
-    """
-    inis = listify_ini(ini)
-
-    for _ in inis:
-        LOG.debug("Processing {}".format(_))
-        lib.takeprofit.clear_profit(_)
-
-@task
-def cancelsellid(_ctx, order_id):
-    """Cancel a sell order in the rdbms table.
-
-    If for some reason `invoke cancelsells` misses re-issuing an open transaction,
-    then you can cancel a specific transaction by providing the `buy.sell_id`
-    column value in the rdbms table buy.
-    """
-
-
-    _, exchange = lib.takeprofit.prep(SYS_INI.any_users_ini)
-
-    lib.takeprofit.clear_order_id(exchange, order_id)
-
-@task
-def sellall(_ctx, ini):
-    """Sell all coins in wallet.
-
-    Occasionally you may need to liquidate all non-BTC coins in your wallet.
-    For instance, if you want to restart RooBot. This task does that.
-
-    Args:
-        ini (str): the ini file that connects to the account to liquidate.
-    """
-    from lib import sellall as _sellall
-
-    _sellall.main(ini)
-
-@task
-def openorders(_ctx, ini):
-    """List the open orders for a particular user..
-
-
-    """
-
-    _, exchange = lib.takeprofit.prep(ini)
-
-    open_orders = exchange.get_open_orders()
-    for order in open_orders['result']:
-        print(order)
-
-
-@task
-def orderhistory(_ctx, ini, market):
-    """List the order history of a user for a market, e.g: BTC-NLG.
-
-
-    """
-
-    _, exchange = lib.takeprofit.prep(ini)
-
-    records = exchange.get_order_history(market)
-    for record in records['result']:
-        print(record)
-
-
-@task
-def getorder(_ctx, ini, market, orderId):
-    """Get  order details
-
-
-    """
-
-    _, exchange = lib.takeprofit.prep(ini)
-
-    _ = exchange.get_order(symbol = market, orderId = uuid)
+#Reviewed by AJV 02/03/2018
+"""Define a collection of tasks invokable from the command-line/cron.
+
+This module leverages `PyInvoke`_ to create tasks relevant ot the execution
+of RooBot. The tasks are ordered in this module in the order that you
+would typically use them:
+    1. you would download the market data via `invoke download`
+    1. The next hour you would download the market data again.
+    1. Then `invoke buy` to buy the coins with the strongest gain.
+    1. Then `invoke takeprofit` to set profit targets for your buys.
+    1. Then `invoke profitreport -d yesterday` to see what profits you made
+    1. Then `invoke cancelsells` to cancel all sell orders so that
+    `invoke takeprofit` then re-issue them.
+    1. On rare occassions, you might liquidate all coins in your portfolio,
+    cancelling all open sell orders. This is usually done when you are
+    restarting / abandoning RooBot usage.
+
+Instead of cron, `invoke daemon` can run download, buy, takeprofit and
+cancelsells from a single long-running process.
+
+Example:
+
+        $ invoke download
+
+Todo:
+    * For module TODOs
+    * You have to also use ``sphinx.ext.todo`` extension
+
+.. _PyInvoke:
+   http://www.pyinvoke.org/
+"""
+
+# core
+import logging
+import random
+
+# 3rd party
+from invoke import task
+
+#local
+import lib.config
+import lib.emailer
+import lib.logconfig
+import lib.report.profit
+import lib.takeprofit
+import lib.workers
+
+
+
+LOG = logging.getLogger('app')
+
+
+def listify_ini(ini, randomize=False):
+    """Coerce the ini argument to a list of 1+ ini-file names.
+
+    When provided with a value V, return a list consisting solely of V.
+    When no value is provided, return a list consisting of the ini files of
+    all active users:
+
+    Args:
+        ini (str): The name of an ini file or a falsy value.
+
+    Returns:
+        A list of 1+ ini-file names
+
+    """
+    if ini:
+        inis = [ini]
+    else:
+        inis = list(lib.config.system().users_inis)
+        if randomize:
+            random.shuffle(inis)
+
+    return inis
+
+@task
+def download(_ctx):
+    """Download the current price data for all markets on Binance.
+
+    Call getmarketsummaries via `the Binance API`_ and append the tickers
+    to the gzipped NDJSON archive in src/tmp/archive.
+
+    Args:
+        None other than the PyInvoke context object.
+
+    Returns:
+        Nothing.
+
+    .. _the Binance API:
+        https://api.binance.com/api/v1/
+
+    """
+    from lib import download as _download
+
+    _download.main(random.choice(lib.config.system().users_inis))
+
+
+@task
+def buy(_ctx, ini=None):
+    """Analyze market data (obtained via `invoke download`) and buy coins.
+
+    Buy compares last hour's market data with this hour and find the coin(s)
+    that have shown the most growth in an hour. It filters out certain coins
+    based on certain criteria. And then buy the top N coin(s).
+
+    Returns:
+        Nothing.
+    """
+    from lib import buy as _buy
+
+    inis = listify_ini(ini, randomize=False)
+    _buy.main(inis)
+
+
+@task
+def stream(_ctx, ini=None):
+    """Buy surging coins as soon as the Binance ticker stream shows them.
+
+    Instead of comparing hourly downloads, keep a rolling window of prices
+    from the ticker WebSocket and run the buy ranking every few seconds.
+    See the `[stream]` section of system.ini.
+    """
+    from lib import stream as _stream
+
+    inis = listify_ini(ini, randomize=False)
+    sys_config = lib.config.system()
+    _stream.watch(
+        inis,
+        url=sys_config.stream_url,
+        windows=sys_config.stream_windows,
+        window=sys_config.stream_window,
+        evaluate_every=sys_config.stream_evaluate,
+        cooldown=sys_config.stream_cooldown,
+        depth_symbols=sys_config.stream_depth_symbols)
+
+
+@task
+def takeprofit(_ctx, ini=None):
+    """Issue SELL LIMIT orders on the coin(s) that have been bought.
+
+    Every 5 minutes this task runs to see if any new coins have been bought.
+    If so, it then sets a profit target for them.
+    """
+
+    inis = listify_ini(ini)
+
+    LOG.debug("Processing {}".format(inis))
+    lib.workers.for_each_user(
+        lib.takeprofit.take_profit, inis,
+        lib.config.system().execution_workers, label='takeprofit')
+
+@task
+def profitreport(_ctx, ini=None, date_string=None, skip_markets=None, jobs=0):
+    """Generate and email a profit report for a certain time frame.
+
+    Args:
+        ini (str): The name of an ini file or a falsy value.
+        date_string : "yesterday" and "lastmonth" are valid values
+        skip_markets: Coins to exclude from calculating the profit report.
+            This is used when a market is under maintenance becauase at that
+            point the exchange API does not return data for that coin.
+        jobs (int): How many reports to generate at once. Defaults to
+            `workers` in the `[execution]` section of system.ini.
+
+    Returns:
+        Nothing. It dumps a csv and html of the email profit report in src/tmp.
+
+    """
+
+    inis = listify_ini(ini)
+
+    if date_string:
+        from datetime import date
+        if date_string == 'yesterday':
+            date_string = "Yesterday"
+            _date = date.fromordinal(date.today().toordinal()-1)
+        elif date_string == 'lastmonth':
+            date_string = "Last month"
+            from dateutil.relativedelta import relativedelta
+            today = date.today()
+            diff = today - relativedelta(months=1)
+            start_of_last_month = date(diff.year, diff.month, 1)
+            end_of_last_month = date(today.year, today.month, 1) - relativedelta(days=1)
+            print("Date range for profit report. Start={}. End={}".format(
+                start_of_last_month, end_of_last_month))
+            _date = [start_of_last_month, end_of_last_month]
+        else:
+            raise Exception("Unrecognized date option")
+    else:
+        _date = None
+
+    if skip_markets:
+        skip_markets = skip_markets.split()
+
+    def _report(user_ini):
+        LOG.debug("Processing {}".format(user_ini))
+        lib.report.profit.main(user_ini, date_string, _date=_date, skip_markets=skip_markets)
+
+    try:
+        lib.workers.for_each_user(
+            _report, inis, jobs or lib.config.system().execution_workers,
+            label='profitreport')
+    finally:
+        # Background sends must reach the server before invoke exits.
+        lib.emailer.flush()
+
+
+
+@task
+def cancelsells(_ctx, ini=None):
+    """Cancel sell orders so that `invoke takeprofit` can re-issue them.
+
+    Binance implemented a policy where a SELL LIMIT order can only be active
+    for 28 days. After that, they close the order. The purpose of this code is
+    to cancel and re-issue the order so that it remains active as long as
+    necessary to close for a profit.
+    """
+    inis = listify_ini(ini)
+
+    LOG.debug("Processing {}".format(inis))
+    lib.workers.for_each_user(
+        lib.takeprofit.clear_profit, inis,
+        lib.config.system().execution_workers, label='cancelsells')
+
+@task
+def cancelsellid(_ctx, order_id):
+    """Cancel a sell order in the rdbms table.
+
+    If for some reason `invoke cancelsells` misses re-issuing an open transaction,
+    then you can cancel a specific transaction by providing the `buy.sell_id`
+    column value in the rdbms table buy.
+    """
+
+
+    _, exchange = lib.takeprofit.prep(lib.config.system().any_users_ini)
+
+    lib.takeprofit.clear_order_id(exchange, order_id)
+
+@task
+def userstream(_ctx, ini=None):
+    """Set profit targets the moment a buy fills.
+
+    Listens to the Binance user data stream of every user (or just `ini`)
+    and issues the SELL LIMIT order of a buy as soon as it is filled,
+    instead of waiting for the next `invoke takeprofit`.
+    """
+    from lib import userstream as _userstream
+
+    _userstream.watch(listify_ini(ini, randomize=False))
+
+
+@task
+def daemon(_ctx):
+    """Run download, buy, takeprofit and cancelsells in one long-lived process.
+
+    This replaces the cron entries. The database connection, the parsed
+    ini files, the Binance clients and the latest snapshot stay in memory
+    between runs; an edited ini file is parsed again by the next job. The
+    interval of each job is set in the `[daemon]` section of system.ini
+    and read when the daemon starts.
+    """
+    from lib import daemon as _daemon
+
+    sys_config = lib.config.system()
+    jobs = [
+        _daemon.Job('download', sys_config.daemon_interval('download', 3600),
+                    lambda: download(_ctx)),
+        _daemon.Job('buy', sys_config.daemon_interval('buy', 3600),
+                    lambda: buy(_ctx)),
+        _daemon.Job('takeprofit',
+                    sys_config.daemon_interval('takeprofit', 300),
+                    lambda: takeprofit(_ctx)),
+        _daemon.Job('cancelsells',
+                    sys_config.daemon_interval('cancelsells', 7 * 24 * 3600),
+                    lambda: cancelsells(_ctx)),
+    ]
+
+    _daemon.Scheduler(jobs).run_forever()
+
+@task
+def sellall(_ctx, ini):
+    """Sell all coins in wallet.
+
+    Occasionally you may need to liquidate all non-BTC coins in your wallet.
+    For instance, if you want to restart RooBot. This task does that.
+
+    Args:
+        ini (str): the ini file that connects to the account to liquidate.
+    """
+    from lib import sellall as _sellall
+
+    _sellall.main(ini)
+
+@task
+def openorders(_ctx, ini):
+    """List the open orders for a particular user..
+
+
+    """
+
+    _, exchange = lib.takeprofit.prep(ini)
+
+    open_orders = exchange.get_open_orders()
+    for order in open_orders['result']:
+        print(order)
+
+
+@task
+def orderhistory(_ctx, ini, market):
+    """List the order history of a user for a market, e.g: BTC-NLG.
+
+
+    """
+
+    _, exchange = lib.takeprofit.prep(ini)
+
+    records = exchange.get_order_history(market)
+    for record in records['result']:
+        print(record)
+
+
+@task
+def getorder(_ctx, ini, market, orderId):
+    """Get  order details
+
+
+    """
+
+    _, exchange = lib.takeprofit.prep(ini)
+
+    _ = exchange.get_order(symbol = market, orderId = uuid)
     print(_)
\ No newline at end of file
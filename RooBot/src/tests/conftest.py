@@ -0,0 +1,54 @@
+"""Run the tests against a scratch copy of the working directory.
+
+RooBot expects to run from `src/`: it reads `system.ini` and `users/`
+from the current directory and keeps `storage.sqlite3` there. The tests
+run from a temporary directory holding `system.ini.sample` as system.ini,
+so they never touch a real database or real settings.
+
+    shell> cd src ; python -m pytest -q
+"""
+
+# core
+import os
+import shutil
+import sys
+import tempfile
+
+# 3rd party
+import pytest
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKDIR = tempfile.mkdtemp(prefix='roobot-tests-')
+shutil.copy(os.path.join(SRC, 'system.ini.sample'),
+            os.path.join(WORKDIR, 'system.ini'))
+os.mkdir(os.path.join(WORKDIR, 'users'))
+os.chdir(WORKDIR)
+
+sys.path.insert(0, SRC)
+
+USER_INI = """[client]
+email = client@example.com
+name = Client
+
+[api]
+key = key
+secret = secret
+
+[trade]
+deposit = 1
+top = {top}
+preserve = 0
+trade = 100
+takeprofit = 5
+"""
+
+
+@pytest.fixture
+def user_ini():
+    "Write `users/<name>` with the given number of top coins; return name."
+    def write(name, top=1):
+        with open(os.path.join('users', name), 'w') as ini_file:
+            ini_file.write(USER_INI.format(top=top))
+        return name
+    return write
@@ -0,0 +1,51 @@
+"""Follow a replayed depth stream with `depthcache.DepthCache`."""
+
+# core
+import json
+import time
+
+# local
+from lib import depthcache
+from lib import stream
+
+
+class FakeExchange:
+    "Returns a REST snapshot that the replayed events continue."
+
+    def get_order_book(self, symbol, limit):
+        return {'lastUpdateId': 100, 'bids': [['1.0', '5']],
+                'asks': [['2.0', '5']]}
+
+
+def depth_event(update_id, bid_quantity):
+    return json.dumps({
+        'stream': 'abcbtc@depth',
+        'data': {'e': 'depthUpdate', 's': 'ABCBTC', 'U': update_id,
+                 'u': update_id, 'b': [['1.0', str(bid_quantity)]], 'a': []},
+    })
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.02)
+
+
+def test_books_go_stale_when_the_stream_closes():
+    frames = [depth_event(update_id, update_id) for update_id in range(99, 140)]
+    server = stream.ReplayServer(frames, delay=0.05).start()
+    cache = depthcache.DepthCache(FakeExchange(), stream_base=server.base)
+    try:
+        cache.track(['ABCBTC'])
+        wait_for(lambda: cache.order_book('ABCBTC') is not None)
+        book = cache.order_book('ABCBTC')
+        assert book['asks'] == [[2.0, 5.0]]
+        assert book['bids'][0][1] > 100
+
+        # The replay ends and closes the stream: no book is served any more.
+        wait_for(lambda: cache.socket is None)
+        assert cache.order_book('ABCBTC') is None
+    finally:
+        cache.stop()
+        server.stop()
@@ -0,0 +1,38 @@
+"""Run `download.main` against a fake Binance client."""
+
+# local
+from lib import archive
+from lib import download
+from lib import mybinance
+from lib import snapshot
+from lib import stats
+
+TICKERS = [
+    {'symbol': 'ETHBTC', 'askPrice': '0.05', 'quoteVolume': '1500.5'},
+    {'symbol': 'ABCBTC', 'askPrice': '0.00001', 'quoteVolume': '42'},
+]
+
+
+class FakeClient:
+    "Answers get_ticker() with a list, as python-binance does."
+
+    def get_ticker(self):
+        return [dict(ticker) for ticker in TICKERS]
+
+
+def test_main_records_a_snapshot_from_the_ticker_list(monkeypatch, user_ini):
+    user_ini('download.ini')
+    monkeypatch.setattr(
+        mybinance, 'make_binance', lambda config: FakeClient())
+
+    download.main('download.ini')
+
+    names, snapshots = snapshot.latest(1)
+    taken_at, asks, volumes = snapshots[0]
+    assert asks[names.index('ETHBTC')] == 0.05
+    assert volumes[names.index('ABCBTC')] == 42
+
+    _, archived = list(archive.snapshots())[-1]
+    assert [ticker['symbol'] for ticker in archived] == ['ETHBTC', 'ABCBTC']
+
+    assert stats.load().count == 1
@@ -0,0 +1,88 @@
+"""`emailer.Postman` over a fake transport."""
+
+# core
+import threading
+
+# 3rd party
+import pytest
+
+# marrow.mailer does not import on every Python 3 (it needs cgi.parse_qsl).
+pytest.importorskip('marrow.mailer', exc_type=ImportError)
+
+# local
+from lib import emailer  # noqa: E402
+
+
+class FakeMailer:
+    "Stands in for marrow.mailer's Mailer and records what it is asked."
+
+    instances = list()
+
+    def __init__(self, config):
+        self.config = config
+        self.started = 0
+        self.stopped = 0
+        self.sent = list()
+        self.threads = set()
+        FakeMailer.instances.append(self)
+
+    def start(self):
+        self.started += 1
+
+    def send(self, message):
+        self.sent.append(message.subject)
+        self.threads.add(threading.current_thread().name)
+
+    def stop(self):
+        self.stopped += 1
+
+
+def outgoing(subject):
+    return emailer.message(subject, 'text', '<p>html</p>',
+                           'bot@example.com', 'client@example.com',
+                           bcc='admin@example.com')
+
+
+def test_one_connection_for_every_message(monkeypatch):
+    monkeypatch.setattr(emailer, 'Mailer', FakeMailer)
+    FakeMailer.instances = list()
+
+    postman = emailer.Postman({'host': 'smtp.example.com', 'port': '587'})
+    for subject in ('one', 'two', 'three'):
+        postman.post(outgoing(subject))
+    assert not FakeMailer.instances
+
+    assert postman.flush() == 3
+    postman.post(outgoing('four'))
+    assert postman.flush() == 1
+    postman.stop()
+
+    mailer, = FakeMailer.instances
+    assert mailer.sent == ['one', 'two', 'three', 'four']
+    assert (mailer.started, mailer.stopped) == (1, 1)
+    transport = mailer.config['transport']
+    assert transport['host'] == 'smtp.example.com'
+    assert transport['max_messages_per_connection'] == \
+        emailer.MAX_MESSAGES_PER_CONNECTION
+
+
+def test_background_postman_delivers_from_its_worker(monkeypatch):
+    monkeypatch.setattr(emailer, 'Mailer', FakeMailer)
+    FakeMailer.instances = list()
+
+    postman = emailer.Postman(background=True)
+    for subject in ('one', 'two'):
+        postman.post(outgoing(subject))
+    postman.flush()
+
+    mailer, = FakeMailer.instances
+    assert mailer.sent == ['one', 'two']
+    assert mailer.threads == {'postman'}
+    postman.stop()
+    assert mailer.stopped == 1
+
+
+def test_flush_without_mail_builds_no_postman(monkeypatch):
+    monkeypatch.setattr(emailer, 'POSTMAN', None)
+    assert emailer.flush() == 0
+    assert emailer.POSTMAN is None
@@ -0,0 +1,37 @@
+"""How many depths `orderbook.fill_for` fetches."""
+
+# local
+from lib import orderbook
+
+
+class FakeExchange:
+    "Serves the first `limit` levels of one book and records each limit."
+
+    def __init__(self, asks):
+        self.asks = asks
+        self.limits = list()
+
+    def get_order_book(self, symbol, limit):
+        self.limits.append(limit)
+        return {'asks': self.asks[:limit], 'bids': []}
+
+
+def test_the_estimated_tier_is_fetched_second():
+    exchange = FakeExchange([[1.0, 0.01]] * 800)
+    fill = orderbook.fill_for(exchange, 'ABCBTC', 0.5)
+    assert exchange.limits == [20, 100]
+    assert fill.depth == 100
+
+
+def test_a_short_estimate_falls_back_to_the_deepest_tier():
+    # 20 large levels make the rest of the book look deeper than it is.
+    exchange = FakeExchange([[1.0, 1.0]] * 20 + [[1.0, 0.001]] * 980)
+    fill = orderbook.fill_for(exchange, 'ABCBTC', 20.5)
+    assert exchange.limits == [20, 50, 1000]
+    assert fill.depth == 1000
+
+
+def test_a_book_too_thin_at_every_tier():
+    exchange = FakeExchange([[1.0, 0.01]] * 800)
+    assert orderbook.fill_for(exchange, 'ABCBTC', 9) is None
+    assert exchange.limits == [20, 1000]
@@ -0,0 +1,59 @@
+"""Fill the order ledger from a fake Binance account."""
+
+# local
+from lib import orders
+
+
+def order(order_id, status='FILLED', executed=1.0):
+    return {
+        'symbol': 'ABCBTC', 'orderId': order_id, 'side': 'BUY',
+        'status': status, 'price': '0.001', 'origQty': '1.0',
+        'executedQty': str(executed), 'cummulativeQuoteQty': '0.001',
+        'time': 1514764800000 + order_id, 'updateTime': 1514764800000 + order_id,
+    }
+
+
+class FakeExchange:
+    "Serves orders 1..9 and one trade per executed order, by id."
+
+    def __init__(self):
+        # Order 3 was cancelled before it executed.
+        self.orders = [order(i) for i in range(1, 10)]
+        self.orders[2] = order(3, 'CANCELED', executed=0)
+        self.trades = [
+            {'id': 100 + o['orderId'], 'orderId': o['orderId'],
+             'commission': '0.5', 'commissionAsset': 'BNB'}
+            for o in self.orders if float(o['executedQty'])
+        ]
+        self.calls = list()
+
+    def get_all_orders(self, symbol, orderId, limit):
+        self.calls.append(('get_all_orders', orderId))
+        return [o for o in self.orders if o['orderId'] >= orderId][:limit]
+
+    def get_my_trades(self, symbol, limit=500, orderId=None, fromId=None):
+        self.calls.append(('get_my_trades', orderId or fromId))
+        if orderId is not None:
+            return [t for t in self.trades if t['orderId'] == orderId]
+        return [t for t in self.trades if t['id'] >= fromId][:limit]
+
+
+def test_lookup_pages_history_by_order_id(monkeypatch):
+    monkeypatch.setattr(orders, 'ALL_ORDERS_LIMIT', 4)
+    exchange = FakeExchange()
+
+    found = orders.lookup(exchange, {'ABCBTC': {'3', '7'}})
+
+    assert set(found) == {('ABCBTC', '3'), ('ABCBTC', '7')}
+    assert found[('ABCBTC', '7')].commission == 0.5
+    assert found[('ABCBTC', '3')].commission == 0.0
+    assert exchange.calls == [
+        ('get_all_orders', 3), ('get_all_orders', 7),
+        # Trades are read from the first trade of order 4.
+        ('get_my_trades', 4), ('get_my_trades', 104), ('get_my_trades', 108),
+    ]
+
+    # Both orders are closed now, so the ledger answers alone.
+    exchange.calls.clear()
+    orders.lookup(exchange, {'ABCBTC': {'3', '7'}})
+    assert exchange.calls == []
@@ -0,0 +1,89 @@
+"""Replay a recorded `!ticker@arr` capture through `stream.watch`."""
+
+# core
+import json
+
+# local
+import lib.config
+from lib import buy
+from lib import stream
+
+START = 1514764800000
+"Event time of the first frame, in Binance milliseconds."
+
+
+def ticker_frame(second, asks):
+    "A `!ticker@arr` frame sent `second` seconds after START."
+    return json.dumps([
+        {'e': '24hrTicker', 'E': START + second * 1000, 's': symbol,
+         'a': '{:.8f}'.format(ask), 'q': '500.0'}
+        for symbol, ask in asks.items()
+    ])
+
+
+def capture(seconds=180, surges=None):
+    """Frames one second apart: FLATBTC holds, each surging market climbs.
+
+    Args:
+        surges (dict): symbol -> total gain over the capture. By default
+            SURGEBTC climbs 20%.
+    """
+    surges = surges or {'SURGEBTC': 0.2}
+    frames = list()
+    for second in range(seconds + 1):
+        asks = {'FLATBTC': 0.001}
+        for symbol, total in surges.items():
+            asks[symbol] = 0.001 * (1 + total * second / seconds)
+        frames.append(ticker_frame(second, asks))
+    return frames
+
+
+def replay(frames, inis, monkeypatch):
+    "Run `watch` over `frames`; return the analyses handed to buy.main."
+    bought = list()
+    monkeypatch.setattr(
+        buy, 'main', lambda inis, analysis: bought.append(analysis))
+
+    server = stream.ReplayServer(frames).start()
+    try:
+        stream.watch(inis, url=server.url, windows=(60,), window=60,
+                     evaluate_every=10, reconnect=False)
+    finally:
+        server.stop()
+    return bought
+
+
+def test_rolling_gains_reads_every_window_from_one_buffer():
+    tracker = stream.RollingGains(windows=(10, 60), resolution=1)
+    for frame in capture():
+        tracker.update_from_message(frame)
+
+    assert len(tracker.samples[tracker.slots['SURGEBTC']]) == 61
+    assert abs(tracker.gains(60)['SURGEBTC'] - 5.88) < 0.01
+    assert abs(tracker.gains(10)['SURGEBTC'] - 0.93) < 0.01
+    assert tracker.gains(60)['FLATBTC'] == 0
+
+
+def test_watch_buys_a_replayed_surge(monkeypatch, user_ini):
+    bought = replay(capture(), [user_ini('stream.ini')], monkeypatch)
+
+    # SURGEBTC cleared min_gain once, then cooled down.
+    assert len(bought) == 1
+    analysis = bought[0]
+    surge = analysis.names.index('SURGEBTC')
+    assert not analysis.skip[surge]
+    gain = (analysis.current[surge] - analysis.previous[surge]) \
+        / analysis.previous[surge] * 100
+    assert gain >= lib.config.system().min_gain
+
+
+def test_markets_beyond_top_do_not_cool_down(monkeypatch, user_ini):
+    frames = capture(surges={'SURGEBTC': 0.3, 'SLOWBTC': 0.2})
+    bought = replay(frames, [user_ini('stream.ini', top=1)], monkeypatch)
+
+    # Only SURGEBTC could be bought first, so SLOWBTC triggers next.
+    assert len(bought) == 2
+    first, second = bought
+    assert not first.skip[first.names.index('SLOWBTC')]
+    assert second.skip[second.names.index('SURGEBTC')]
+    assert not second.skip[second.names.index('SLOWBTC')]
@@ -0,0 +1,130 @@
+"""Replay a recorded user data stream through `userstream.UserStream`."""
+
+# core
+import json
+
+# local
+from lib import buy
+from lib import stream
+from lib import takeprofit
+from lib import userstream
+from lib.db import db
+
+CONFIG_FILE = 'replay.ini'
+
+
+def execution_report(order_id, status, side='BUY', symbol='ABCBTC'):
+    return json.dumps({
+        'e': 'executionReport', 's': symbol, 'S': side, 'X': status,
+        'i': order_id,
+    })
+
+
+class FakeExchange:
+    "Records sells; every order it is asked about has filled."
+
+    def __init__(self, orders=None):
+        self.sells = list()
+        self.orders = orders or dict()
+        "order id -> fields that differ from a plain fill"
+
+    def stream_get_listen_key(self):
+        return 'listen-key'
+
+    def stream_keepalive(self, listenKey):
+        pass
+
+    def order_limit_sell(self, symbol, quantity, price):
+        self.sells.append((symbol, quantity, price))
+        return {'status': 'NEW', 'orderId': 1000 + len(self.sells)}
+
+    def get_all_orders(self, symbol, orderId, limit):
+        return [
+            dict({'orderId': int(row.order_id), 'status': 'FILLED'},
+                 **self.orders.get(row.order_id, {}))
+            for row in db(db.buy.config_file == CONFIG_FILE).select()
+        ]
+
+
+def rows():
+    return {
+        row.order_id: row
+        for row in db(db.buy.config_file == CONFIG_FILE).select()
+    }
+
+
+def test_replayed_fills_are_sold_once():
+    db(db.buy.config_file == CONFIG_FILE).delete()
+    db.commit()
+    # Buy 1 was placed and recorded before it filled.
+    buy.record_buy(CONFIG_FILE, 1, 'ABCBTC', 0.001, 10, 'NEW')
+
+    frames = [
+        execution_report(1, 'NEW'),
+        execution_report(1, 'FILLED'),
+        execution_report(1, 'FILLED'),
+        # Buy 2 fills before _buycoin has recorded it.
+        execution_report(2, 'FILLED'),
+        execution_report(3, 'FILLED', side='SELL'),
+    ]
+    exchange = FakeExchange()
+    server = stream.ReplayServer(frames).start()
+    try:
+        user_stream = userstream.UserStream(
+            CONFIG_FILE, exchange, 5, stream_base=server.base)
+        user_stream.run(reconnect=False)
+    finally:
+        server.stop()
+
+    assert len(exchange.sells) == 1
+    assert rows()['1'].status == 'FILLED'
+    assert rows()['1'].filled_at is not None
+    assert list(user_stream.unmatched) == ['2']
+
+    buy.record_buy(CONFIG_FILE, 2, 'ABCBTC', 0.002, 5, 'FILLED')
+    assert user_stream.retry_unmatched() == 1
+    assert not user_stream.unmatched
+    assert len(exchange.sells) == 2
+
+    # Both sells are placed; a takeprofit run finds nothing left to sell.
+    takeprofit.takeprofit(CONFIG_FILE, exchange, 5)
+    assert len(exchange.sells) == 2
+    assert all(row.sell_id for row in rows().values())
+
+
+def test_a_claimed_row_is_not_sold_again():
+    db(db.buy.config_file == CONFIG_FILE).delete()
+    db.commit()
+    buy.record_buy(CONFIG_FILE, 4, 'ABCBTC', 0.001, 10, 'FILLED')
+    row = rows()['4']
+
+    assert takeprofit.claim(row)
+    assert not takeprofit.claim(row)
+    assert takeprofit._takeprofit(FakeExchange(), 5, row) is False
+
+    takeprofit.release(row)
+    exchange = FakeExchange()
+    assert takeprofit._takeprofit(exchange, 5, row) is True
+    assert len(exchange.sells) == 1
+
+
+def test_ended_buys_are_retired_and_partial_fills_sold():
+    db(db.buy.config_file == CONFIG_FILE).delete()
+    db.commit()
+    buy.record_buy(CONFIG_FILE, 5, 'ABCBTC', 0.001, 10, 'NEW')
+    buy.record_buy(CONFIG_FILE, 6, 'ABCBTC', 0.001, 10, 'NEW')
+    exchange = FakeExchange({
+        '5': {'status': 'CANCELED', 'executedQty': '0.00000000'},
+        '6': {'status': 'EXPIRED', 'executedQty': '4.00000000'},
+    })
+
+    takeprofit.takeprofit(CONFIG_FILE, exchange, 5)
+    assert [quantity for _, quantity, _ in exchange.sells] == [4.0]
+    assert rows()['5'].status == 'CANCELED'
+    assert rows()['6'].status == 'FILLED'
+    assert rows()['6'].amount == 4.0
+
+    # The cancelled buy is no longer looked up or sold.
+    exchange.get_all_orders = exchange.get_order = None
+    takeprofit.takeprofit(CONFIG_FILE, exchange, 5)
+    assert len(exchange.sells) == 1
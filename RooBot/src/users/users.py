@@ -1,16 +1,14 @@
-# -*- coding: utf-8 -*-
-
-# ini-terrence.brannon@gmail.ini
-# ini-steadyvest.radar.ini
-# ini-steadyvest.strategic.ini
-# ini-msamitech@yahoo.ini
-#
-
-
-
-def read(ini):
-    import configparser
-    config = configparser.RawConfigParser()
-    with open("users/" + ini) as f:
-        config.readfp(f)
-    return config
+# -*- coding: utf-8 -*-
+
+# ini-terrence.brannon@gmail.ini
+# ini-steadyvest.radar.ini
+# ini-steadyvest.strategic.ini
+# ini-msamitech@yahoo.ini
+#
+
+
+
+def read(ini):
+    "The parsed `users/<ini>`, shared with `lib.config.user`."
+    import lib.config
+    return lib.config.user(ini).config